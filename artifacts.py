@@ -0,0 +1,101 @@
+"""
+Session-scoped store for the arrays and bit sequences produced by the pages.
+
+Each stage puts its output under the name of the file it used to write
+(`nyquist_signal`, `modulated_signal_ASK`, ...) and the next page gets it
+back by reference, without any disk round-trip, and without seeing the
+outputs of the other sessions. Names missing from the store fall back to the
+files on disk, so previously exported or legacy files keep working. Nothing
+is written to disk until `export` or `export_all` is called.
+
+The store itself does not depend on Streamlit; `utils.session_artifacts`
+keeps one per browser session in `st.session_state`.
+"""
+import os
+
+import numpy as np
+
+import bit_sequence
+import stage_cache
+
+BIT_SEQUENCE = os.path.splitext(bit_sequence.BIT_SEQUENCE_FILE)[0]
+
+
+def artifact_name(filename):
+    """Store name of a file: its base name without extension."""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def _read_only(value):
+    if isinstance(value, np.ndarray):
+        value = value.view()
+        value.flags.writeable = False
+    return value
+
+
+class ArtifactStore:
+    """Named arrays (or BitSequences) with their metadata, kept in memory."""
+
+    def __init__(self):
+        self._items = {}
+
+    def __contains__(self, name):
+        return artifact_name(name) in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def names(self):
+        return list(self._items)
+
+    @property
+    def nbytes(self):
+        return sum(value.nbytes for value, _ in self._items.values())
+
+    def put(self, name, value, **metadata):
+        """Stores `value` under `name` (a file name is reduced to its stem), read-only."""
+        self._items[artifact_name(name)] = (_read_only(value), metadata)
+        return value
+
+    def get(self, name):
+        """Returns (value, metadata); KeyError when the name was never put."""
+        return self._items[artifact_name(name)]
+
+    def remove(self, name):
+        self._items.pop(artifact_name(name), None)
+
+    def clear(self):
+        self._items.clear()
+
+    def signal(self, filename):
+        """(array, metadata) from the store, otherwise from the file (see `signal_io.load_signal`)."""
+        if filename in self:
+            return self.get(filename)
+        return stage_cache.load_signal(filename)
+
+    def put_bit_sequence(self, bits):
+        return self.put(BIT_SEQUENCE, bits, period_ms=bits.period_ms)
+
+    def bit_sequence(self, filename=None):
+        """The session's bit sequence, otherwise the saved one (see `bit_sequence.load_bit_sequence`)."""
+        if filename is None and BIT_SEQUENCE in self:
+            return self.get(BIT_SEQUENCE)[0]
+        return stage_cache.load_bit_sequence(filename)
+
+    def export(self, name, directory="."):
+        """Writes one artifact to `directory`, returning the path written."""
+        from signal_io import save_signal
+
+        value, metadata = self.get(name)
+        if isinstance(value, bit_sequence.BitSequence):
+            path = os.path.join(directory, bit_sequence.BIT_SEQUENCE_FILE)
+            value.save(path)
+            return path
+        path = os.path.join(directory, artifact_name(name) + ".npy")
+        save_signal(value, path, **metadata)
+        return path
+
+    def export_all(self, directory="."):
+        """Writes every artifact to `directory`, returning the paths written."""
+        os.makedirs(directory, exist_ok=True)
+        return [self.export(name, directory) for name in self.names()]
@@ -0,0 +1,203 @@
+"""
+Benchmarks of every chain stage and of the whole chain over sequence sizes.
+
+Each case is timed (best of `repeat` runs) and its peak traced memory is
+measured with tracemalloc, which also follows NumPy allocations. Throughput
+is reported in bits/s and in samples/s of the stage's signal. Results are
+saved as JSON under `.benchmarks/`, named after the current git commit, and
+a run can be compared with a saved one: cases slower (or using more memory)
+than the baseline by more than the tolerance are flagged as regressions.
+
+    python benchmarks.py --sizes 3 4 5 6 --save
+    python benchmarks.py --compare .benchmarks/<commit>.json
+
+10^7 bits (--sizes 7) needs a few GB of memory for the signal stages.
+"""
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+import chain
+import line_coding
+import precision
+from mapping import SCHEMES
+
+RESULTS_DIR = ".benchmarks"
+# Short symbols keep the 10^7-bit signals within a few hundred MB each
+TS_MS = 4
+SAMPLING_RATE = 1000
+CARRIER = 100
+
+
+def _signals(num_bits, seed=0):
+    """Bits and the stage inputs derived from them, computed once per size."""
+    bits = np.random.default_rng(seed).integers(0, 2, num_bits, dtype=np.int8)
+    baseband = chain.filtre_nyquist(bits, TS_MS, SAMPLING_RATE)
+    modulated = chain.modulate(baseband, "ASK", SAMPLING_RATE, CARRIER)
+    received = chain.add_noise(modulated, 0.1, rng=seed)
+    demodulated = chain.coherent_demodulate(received, CARRIER, SAMPLING_RATE)
+    return {"bits": bits, "baseband": baseband, "modulated": modulated, "received": received,
+            "demodulated": demodulated}
+
+
+def _line_coder(code):
+    return lambda s: line_coding.apply_filter(s["bits"], code)
+
+
+def _nyquist_filter(s):
+    from pulse_shaping import pulse_shape
+
+    return pulse_shape(s["bits"], chain.samples_per_symbol(TS_MS, SAMPLING_RATE), "Half-sine")
+
+
+def _carrier(s):
+    from carrier import estimate_carrier
+
+    return estimate_carrier(s["received"], SAMPLING_RATE)
+
+
+# name -> (function of the prepared signals, key of the signal whose length counts as samples)
+STAGES = {
+    **{f"apply_{code}": (_line_coder(code), "bits") for code in line_coding.LINE_CODES},
+    "nyquist_filter": (_nyquist_filter, "baseband"),
+    "filtre_nyquist": (lambda s: chain.filtre_nyquist(s["bits"], TS_MS, SAMPLING_RATE), "baseband"),
+    **{f"modulate_signal[{m}]": ((lambda m: lambda s: chain.modulate(s["baseband"], m, SAMPLING_RATE, CARRIER))(m),
+                                 "baseband") for m in chain.MODULATIONS},
+    **{f"modulate_mary[{m}]": ((lambda m: lambda s: chain.modulate_mary(s["bits"], m, TS_MS, SAMPLING_RATE, CARRIER))(m),
+                               "baseband") for m in SCHEMES},
+    "add_noise": (lambda s: chain.add_noise(s["modulated"], 0.1, rng=1), "modulated"),
+    "demodulate": (lambda s: chain.coherent_demodulate(s["received"], CARRIER, SAMPLING_RATE), "received"),
+    "demodulate_iq": (lambda s: chain.demodulate(s["received"], "ASK", CARRIER, SAMPLING_RATE, phase=0.0),
+                      "received"),
+    "detect_carrier_frequency": (_carrier, "received"),
+    "extract_binary_sequence": (lambda s: chain.decide(s["demodulated"], TS_MS, SAMPLING_RATE), "demodulated"),
+    "run_chain": (lambda s: chain.run_chain(s["bits"], TS_MS, sampling_rate=SAMPLING_RATE, f0=CARRIER,
+                                            noise_level=0.1, rng=1), "received"),
+}
+
+
+def measure(func, signals, repeat=3):
+    """Best wall time over `repeat` runs and peak traced memory of one run (bytes)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(signals)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(signals)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(sizes=(3, 4, 5, 6), stages=None, repeat=3, progress=None):
+    """Runs every stage at 10**size bits; returns one row per (stage, size)."""
+    rows = []
+    for size in sizes:
+        num_bits = 10 ** size
+        signals = _signals(num_bits)
+        for name in stages or STAGES:
+            func, counted = STAGES[name]
+            seconds, peak = measure(func, signals, repeat if size < 7 else 1)
+            row = {
+                "stage": name,
+                "precision": precision.current().name,
+                "bits": num_bits,
+                "samples": len(signals[counted]),
+                "seconds": seconds,
+                "bits_per_s": num_bits / seconds,
+                "samples_per_s": len(signals[counted]) / seconds,
+                "peak_bytes": peak,
+            }
+            rows.append(row)
+            if progress:
+                progress(row)
+        del signals
+    return rows
+
+
+def git_commit():
+    """Short hash of HEAD, with '-dirty' when the tree has changes; 'unknown' outside git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", "*.py"]).returncode
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def save(rows, directory=RESULTS_DIR, name=None):
+    """Writes the rows to <directory>/<commit>.json and returns the path."""
+    os.makedirs(directory, exist_ok=True)
+    name = name or git_commit()
+    path = os.path.join(directory, f"{name}.json")
+    with open(path, "w") as file:
+        json.dump({"commit": name, "time": time.time(), "results": rows}, file, indent=1)
+    return path
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)["results"]
+
+
+def compare(baseline, current, tolerance=0.2, min_seconds=1e-3):
+    """
+    Rows of `current` with their ratio to the matching `baseline` row (time
+    and peak memory) and a `regression` flag when a ratio exceeds 1 + tolerance.
+    Times under `min_seconds` in both runs are too noisy to flag.
+    """
+    reference = {(r["stage"], r["bits"], r.get("precision", "float64")): r for r in baseline}
+    rows = []
+    for r in current:
+        base = reference.get((r["stage"], r["bits"], r.get("precision", "float64")))
+        if base is None:
+            continue
+        time_ratio = r["seconds"] / base["seconds"]
+        memory_ratio = r["peak_bytes"] / base["peak_bytes"] if base["peak_bytes"] else 1.0
+        slower = time_ratio > 1 + tolerance and max(r["seconds"], base["seconds"]) >= min_seconds
+        rows.append({**r, "time_ratio": time_ratio, "memory_ratio": memory_ratio,
+                     "regression": slower or memory_ratio > 1 + tolerance})
+    return rows
+
+
+def format_row(row):
+    line = (f"{row['stage']:<26}{row['bits']:>10}{row['seconds'] * 1e3:>11.2f} ms"
+            f"{row['bits_per_s']:>11.3g} bit/s{row['samples_per_s']:>11.3g} sample/s"
+            f"{row['peak_bytes'] / 2**20:>9.1f} MiB")
+    if "time_ratio" in row:
+        line += f"  x{row['time_ratio']:.2f} time x{row['memory_ratio']:.2f} mem"
+        line += "  REGRESSION" if row["regression"] else ""
+    return line
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Benchmark the chain stages over sequence sizes")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[3, 4, 5, 6], help="powers of ten of bits")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", action="store_true", help=f"save the results under {RESULTS_DIR}/")
+    parser.add_argument("--compare", metavar="JSON", help="baseline results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--precision", default="float64", choices=precision.PRECISIONS)
+    args = parser.parse_args()
+    precision.set_precision(args.precision)
+
+    rows = run(args.sizes, args.stages, args.repeat, progress=None if args.compare else lambda r: print(format_row(r)))
+    if args.save:
+        print("saved", save(rows, name=None if args.precision == "float64" else f"{git_commit()}-{args.precision}"))
+    if args.compare:
+        compared = compare(load(args.compare), rows, args.tolerance)
+        for row in compared:
+            print(format_row(row))
+        regressions = [r for r in compared if r["regression"]]
+        print(f"{len(regressions)} regression(s) against {args.compare}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,196 @@
+"""
+Monte Carlo bit error rate sweep over Eb/N0 for the modulations of page 4.
+
+Every Eb/N0 point runs batches of independent frames as 2-D arrays
+(frames x samples) until `target_errors` bit errors or `max_bits` bits are
+reached. Each batch has its own `np.random.Generator`, spawned in order from
+the `SeedSequence` of its point, and the batches of all unfinished points
+are spread over a process pool. Their counts are merged in batch order and
+the batches after the stopping one are dropped, so a sweep gives the same
+result whatever the number of workers.
+
+The modulators follow `modulate_signal`: ASK multiplies the NRZ levels (+1/-1,
+as in the chain) by the carrier, FSK and PSK take 0/1 levels. The receiver is
+the coherent correlator for the two candidate waveforms of each bit, which is
+what the theoretical curves assume.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+MODULATIONS = ["ASK", "FSK", "PSK"]
+
+
+def theoretical_ber(modulation_type, ebn0_db):
+    """Closed-form bit error probability of coherent detection."""
+    from scipy.special import erfc
+
+    ebn0 = 10 ** (np.asarray(ebn0_db, dtype=np.float64) / 10)
+    if modulation_type in ("ASK", "PSK"):
+        # Antipodal signals: Q(sqrt(2 Eb/N0))
+        return 0.5 * erfc(np.sqrt(ebn0))
+    elif modulation_type == "FSK":
+        # Orthogonal signals: Q(sqrt(Eb/N0))
+        return 0.5 * erfc(np.sqrt(ebn0 / 2))
+    raise ValueError(f"Unsupported modulation type: {modulation_type}")
+
+
+def _candidates(bits, modulation_type, samples_per_bit, sampling_rate, f0):
+    """
+    Returns the transmitted waveform and, for every bit, the waveforms that a 0
+    and a 1 would have produced, all shaped (frames, bits, samples_per_bit).
+    """
+    frames, num_bits = bits.shape
+    t = (np.arange(num_bits * samples_per_bit) / sampling_rate).reshape(num_bits, samples_per_bit)
+    if modulation_type == "ASK":
+        carrier = np.cos(2 * np.pi * f0 * t)
+        s0, s1 = -carrier, carrier
+    elif modulation_type == "PSK":
+        carrier = np.cos(2 * np.pi * f0 * t)
+        s0, s1 = carrier, -carrier
+    elif modulation_type == "FSK":
+        f1, f2 = f0, 2 * f0
+        # cumsum of the 0/1 levels at the start of every bit
+        before = (np.cumsum(bits, axis=1) - bits) * samples_per_bit
+        ramp = np.arange(1, samples_per_bit + 1)
+        phase = f1 * t + (f2 - f1) * before[:, :, None] / sampling_rate
+        s0 = np.cos(2 * np.pi * phase)
+        s1 = np.cos(2 * np.pi * (phase + (f2 - f1) * ramp / sampling_rate))
+    else:
+        raise ValueError(f"Unsupported modulation type: {modulation_type}")
+    s0, s1 = np.broadcast_to(s0, (frames,) + t.shape), np.broadcast_to(s1, (frames,) + t.shape)
+    tx = np.where(bits[:, :, None] == 1, s1, s0)
+    return tx, s0, s1
+
+
+def simulate_batch(modulation_type, ebn0_db, seed, num_bits=1000, frames_per_batch=64, Ts=20,
+                   sampling_rate=1000, f0=100):
+    """Runs one batch of frames at one Eb/N0 and returns its (errors, bits)."""
+    rng = np.random.default_rng(seed)
+    samples_per_bit = int(Ts * sampling_rate / 1000)
+    ebn0 = 10 ** (ebn0_db / 10)
+    bits = rng.integers(0, 2, (frames_per_batch, num_bits), dtype=np.int8)
+    tx, s0, s1 = _candidates(bits, modulation_type, samples_per_bit, sampling_rate, f0)
+
+    # Noise variance per sample N0 / 2, with Eb measured on the transmitted batch
+    eb = np.mean(tx ** 2) * samples_per_bit
+    sigma = np.sqrt(eb / (2 * ebn0))
+    rx = tx + sigma * rng.standard_normal(tx.shape)
+
+    # Minimum-distance decision between the two candidates of every bit
+    metric = np.sum(rx * (s1 - s0), axis=2) - 0.5 * np.sum(s1 ** 2 - s0 ** 2, axis=2)
+    decided = metric > 0
+    return int(np.count_nonzero(decided != (bits == 1))), bits.size
+
+
+class _Point:
+    """Merged counts of one (modulation, Eb/N0) point, batch after batch."""
+
+    def __init__(self, modulation_type, ebn0_db, seed, target_errors, max_bits):
+        self.modulation_type = modulation_type
+        self.ebn0_db = ebn0_db
+        self.seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.target_errors = target_errors
+        self.max_bits = max_bits
+        self.errors = 0
+        self.total = 0
+
+    @property
+    def done(self):
+        return self.errors >= self.target_errors or self.total >= self.max_bits
+
+    def merge(self, counts):
+        """Adds batch counts in batch order, ignoring those after the stop."""
+        for errors, bits in counts:
+            if self.done:
+                break
+            self.errors += errors
+            self.total += bits
+
+    def row(self):
+        return {
+            "modulation": self.modulation_type,
+            "ebn0_db": float(self.ebn0_db),
+            "bits": self.total,
+            "errors": self.errors,
+            "ber": self.errors / self.total,
+            "theory": float(theoretical_ber(self.modulation_type, self.ebn0_db)),
+        }
+
+
+def simulate_point(modulation_type, ebn0_db, seed, target_errors=200, max_bits=10**7, **options):
+    """Runs batches of frames at one Eb/N0 until enough errors are counted."""
+    point = _Point(modulation_type, ebn0_db, seed, target_errors, max_bits)
+    while not point.done:
+        point.merge([simulate_batch(modulation_type, ebn0_db, point.seed.spawn(1)[0], **options)])
+    return point.row()
+
+
+def _simulate_batch(args):
+    modulation_type, ebn0_db, seed, options = args
+    return simulate_batch(modulation_type, ebn0_db, seed, **options)
+
+
+def run_ber_sweep(modulations=MODULATIONS, ebn0_db=np.arange(0, 13), seed=0, workers=None, target_errors=200,
+                  max_bits=10**7, **options):
+    """
+    Sweeps every (modulation, Eb/N0) point, in parallel when `workers` > 1:
+    each round gives every worker a batch of an unfinished point. Returns one
+    row per point: bits, errors, measured and theoretical BER.
+    """
+    keys = [(m, float(e)) for m in modulations for e in ebn0_db]
+    seeds = np.random.SeedSequence(seed).spawn(len(keys))
+    points = [_Point(m, e, s, target_errors, max_bits) for (m, e), s in zip(keys, seeds)]
+    workers = os.cpu_count() if workers is None else workers
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        pending = [p for p in points if not p.done]
+        while pending:
+            per_point = -(-workers // len(pending))
+            tasks = [(p.modulation_type, p.ebn0_db, s, options) for p in pending for s in p.seed.spawn(per_point)]
+            counts = list(pool.map(_simulate_batch, tasks)) if pool else [_simulate_batch(t) for t in tasks]
+            for i, point in enumerate(pending):
+                point.merge(counts[i * per_point:(i + 1) * per_point])
+            pending = [p for p in pending if not p.done]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return [p.row() for p in points]
+
+
+def ber_curve(results, modulation_type):
+    """Returns (ebn0_db, ber, theory) arrays of one modulation from the sweep rows."""
+    rows = sorted((r for r in results if r["modulation"] == modulation_type), key=lambda r: r["ebn0_db"])
+    return (np.array([r["ebn0_db"] for r in rows]),
+            np.array([r["ber"] for r in rows]),
+            np.array([r["theory"] for r in rows]))
+
+
+def format_table(results):
+    """Formats the sweep rows as a text table."""
+    lines = [f"{'mod':<5}{'Eb/N0':>7}{'bits':>11}{'errors':>8}{'BER':>11}{'theory':>11}"]
+    for r in results:
+        lines.append(f"{r['modulation']:<5}{r['ebn0_db']:>7.1f}{r['bits']:>11}{r['errors']:>8}"
+                     f"{r['ber']:>11.3e}{r['theory']:>11.3e}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Monte Carlo BER vs Eb/N0 sweep")
+    parser.add_argument("--modulations", nargs="+", default=MODULATIONS)
+    parser.add_argument("--ebn0", nargs="+", type=float, default=list(range(0, 13)))
+    parser.add_argument("--target-errors", type=int, default=200)
+    parser.add_argument("--max-bits", type=int, default=10**7)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_ber_sweep(args.modulations, args.ebn0, seed=args.seed, workers=args.workers,
+                            target_errors=args.target_errors, max_bits=args.max_bits)
+    print(format_table(results))
+    print(f"{time.perf_counter() - start:.1f} s")
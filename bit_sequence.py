@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+
+from profiling import instrument
+
+BIT_SEQUENCE_FILE = "binary_sequence_and_period.npz"
+LEGACY_BIT_SEQUENCE_FILE = "binary_sequence_and_period.txt"
+
+# Number of set bits in every possible byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Bipolar (+1/-1) expansion of every possible byte value, MSB first
+_BIPOLAR = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).astype(np.int8) * 2 - 1
+
+
+class BitSequence:
+    """Binary sequence stored one bit per bit (np.packbits) with its symbol period."""
+
+    def __init__(self, packed, num_bits, period_ms=0.0):
+        packed = np.asarray(packed, dtype=np.uint8).ravel()
+        if len(packed) != (num_bits + 7) // 8:
+            raise ValueError(f"{len(packed)} bytes cannot hold {num_bits} bits.")
+        tail = num_bits % 8
+        if tail and packed[-1] & (0xFF >> tail):
+            # Keep the padding bits at zero so that byte-wise comparisons stay exact
+            packed = packed.copy()
+            packed[-1] &= (0xFF << (8 - tail)) & 0xFF
+        self.packed = packed
+        self.num_bits = int(num_bits)
+        self.period_ms = float(period_ms)
+
+    @classmethod
+    def from_bits(cls, bits, period_ms=0.0):
+        """Builds the sequence from any array-like of 0/1 values."""
+        bits = np.asarray(bits).ravel()
+        return cls(np.packbits(bits == 1), len(bits), period_ms)
+
+    @classmethod
+    def from_string(cls, text, period_ms=0.0):
+        """Builds the sequence from a '0'/'1' string."""
+        codes = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        if np.any((codes != ord("0")) & (codes != ord("1"))):
+            raise ValueError("The binary sequence must only contain 0 and 1.")
+        return cls(np.packbits(codes == ord("1")), len(codes), period_ms)
+
+    @classmethod
+    def random(cls, num_bits, period_ms=0.0, rng=None):
+        """Draws a uniformly random sequence directly in packed form."""
+        rng = np.random.default_rng(rng)
+        packed = rng.integers(0, 256, (num_bits + 7) // 8, dtype=np.uint8)
+        return cls(packed, num_bits, period_ms)
+
+    def __len__(self):
+        return self.num_bits
+
+    def __iter__(self):
+        return iter(self.to_bits().tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        bits = self.to_bits()
+        return bits if dtype is None else bits.astype(dtype)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.num_bits)
+            if step == 1 and start % 8 == 0:
+                stop = max(stop, start)
+                return BitSequence(self.packed[start // 8:(stop + 7) // 8], stop - start, self.period_ms)
+            return BitSequence.from_bits(self.to_bits()[key], self.period_ms)
+        index = int(key)
+        if index < 0:
+            index += self.num_bits
+        if not 0 <= index < self.num_bits:
+            raise IndexError("bit index out of range")
+        return int(self.packed[index >> 3] >> (7 - (index & 7))) & 1
+
+    def __str__(self):
+        return (self.to_bits() + ord("0")).tobytes().decode("ascii")
+
+    def __repr__(self):
+        text = str(self[:64])
+        if self.num_bits > 64:
+            text += "..."
+        return f"BitSequence('{text}', num_bits={self.num_bits}, period_ms={self.period_ms})"
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def to_bits(self):
+        """Returns the bits as a uint8 array of 0/1 values."""
+        return np.unpackbits(self.packed, count=self.num_bits)
+
+    def to_bipolar(self, dtype=np.float64):
+        """Returns the bits mapped to +1 (bit 1) and -1 (bit 0)."""
+        return _BIPOLAR[self.packed].ravel()[:self.num_bits].astype(dtype)
+
+    def bit_errors(self, other):
+        """Counts the differing bits between two sequences of the same length."""
+        if not isinstance(other, BitSequence):
+            other = BitSequence.from_bits(other)
+        if other.num_bits != self.num_bits:
+            raise ValueError(f"Cannot compare {self.num_bits} bits with {other.num_bits} bits.")
+        return int(_POPCOUNT[np.bitwise_xor(self.packed, other.packed)].sum(dtype=np.int64))
+
+    def bit_error_rate(self, other):
+        """Fraction of differing bits between two sequences."""
+        return self.bit_errors(other) / self.num_bits if self.num_bits else 0.0
+
+    def save(self, filename=BIT_SEQUENCE_FILE):
+        """Saves the packed bits and the period to a .npz file."""
+        with open(filename + ".tmp", "wb") as file:
+            np.savez(file, packed=self.packed, num_bits=self.num_bits, period_ms=self.period_ms)
+        os.replace(filename + ".tmp", filename)
+
+    @classmethod
+    def load(cls, filename=BIT_SEQUENCE_FILE):
+        """Loads a sequence saved by `save`."""
+        with np.load(filename) as data:
+            return cls(data["packed"], int(data["num_bits"]), float(data["period_ms"]))
+
+    def save_txt(self, filename=LEGACY_BIT_SEQUENCE_FILE):
+        """Writes the legacy text format, one 'bit period' line per bit."""
+        data = np.column_stack((self.to_bits(), np.full(self.num_bits, self.period_ms)))
+        np.savetxt(filename, data, fmt='%d %.2f', header='Binary Sequence   Period (ms)', comments='')
+
+    @classmethod
+    def load_txt(cls, filename=LEGACY_BIT_SEQUENCE_FILE):
+        """Reads the legacy text format written by page 1."""
+        data = np.loadtxt(filename, skiprows=1, ndmin=2)
+        if data.size == 0:
+            return cls(np.zeros(0, dtype=np.uint8), 0)
+        periods = np.unique(data[:, 1])
+        if len(periods) != 1:
+            raise ValueError("The periods in the file are not consistent.")
+        return cls.from_bits(data[:, 0].astype(np.int8), periods[0])
+
+
+def bit_sequence_file(filename=None):
+    """The packed file when present, otherwise the legacy text file."""
+    if filename is None:
+        filename = BIT_SEQUENCE_FILE if os.path.exists(BIT_SEQUENCE_FILE) else LEGACY_BIT_SEQUENCE_FILE
+    return filename
+
+
+@instrument
+def load_bit_sequence(filename=None):
+    """
+    Loads a bit sequence from a .npz or legacy .txt file. Without a filename the
+    packed file is used when present, otherwise the legacy text file.
+    """
+    filename = bit_sequence_file(filename)
+    if filename.endswith(".npz"):
+        return BitSequence.load(filename)
+    return BitSequence.load_txt(filename)
@@ -0,0 +1,195 @@
+"""
+Carrier-frequency estimation.
+
+- "welch": peak of the averaged periodogram of Hann-windowed segments, whose
+  cost grows as N log(nperseg) instead of N log(N) for one FFT of the capture;
+- "zoom": zoom FFT (chirp z-transform) restricted to a candidate band, giving a
+  fine frequency grid over that band only;
+- "goertzel": power at a handful of candidate frequencies around a coarse
+  Welch peak, one second-order recursion per candidate (only its final
+  state is computed).
+
+Every mode refines the peak between grid points by parabolic interpolation of
+the log magnitude. `track_carrier` follows the frequency over time with one
+windowed FFT per frame, all frames in one batched call, and `CarrierTracker`
+re-estimates on every block of a streaming receiver, searching only around the
+previous estimate.
+"""
+import numpy as np
+
+from profiling import instrument
+
+CARRIER_METHODS = ["welch", "zoom", "goertzel"]
+# Candidates of the "goertzel" method, spread over +/- one Welch bin
+GOERTZEL_CANDIDATES = 9
+
+
+def _parabolic_offset(mag, k):
+    """Fractional offset (in grid steps) of the true peak around index `k`."""
+    mag = np.asarray(mag)
+    k = np.asarray(k)
+    inner = (k > 0) & (k < mag.shape[-1] - 1)
+    kk = np.clip(k, 1, mag.shape[-1] - 2)
+    with np.errstate(divide='ignore'):
+        a, b, c = (np.log(np.take_along_axis(mag, np.expand_dims(kk + d, -1), -1)[..., 0] + 1e-300)
+                   for d in (-1, 0, 1))
+    denom = a - 2 * b + c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(inner & (denom < 0), 0.5 * (a - c) / denom, 0.0)
+    return offset
+
+
+def _band_slice(freqs, band):
+    if band is None:
+        return slice(None)
+    lo, hi = np.searchsorted(freqs, band[0]), np.searchsorted(freqs, band[1], side="right")
+    return slice(lo, max(hi, lo + 1))
+
+
+def _frames(x, size, hop):
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) < size:
+        x = np.concatenate((x, np.zeros(size - len(x))))
+    return np.lib.stride_tricks.sliding_window_view(x, size)[::hop]
+
+
+def welch_peak(x, fs, nperseg=4096, band=None, nfft=None):
+    """Peak frequency of the averaged periodogram, optionally within `band`."""
+    nperseg = min(nperseg, len(x))
+    nfft = nfft or nperseg
+    frames = _frames(x, nperseg, nperseg // 2)
+    window = np.hanning(nperseg)
+    power = np.zeros(nfft // 2 + 1)
+    # Batches of frames keep the temporary spectra small on long captures
+    for start in range(0, len(frames), 256):
+        power += np.sum(np.abs(np.fft.rfft(frames[start:start + 256] * window, nfft, axis=1)) ** 2, axis=0)
+    freqs = np.fft.rfftfreq(nfft, 1 / fs)
+    band_slice = _band_slice(freqs, band)
+    mag = np.sqrt(power[band_slice])
+    k = int(np.argmax(mag))
+    step = fs / nfft
+    return freqs[band_slice][k] + step * float(_parabolic_offset(mag, k))
+
+
+def _analysis_frames(x, fs, step):
+    """
+    Hann-windowed frames just long enough to resolve grid points `step` Hz
+    apart: analysing the whole capture would make the peak narrower than the
+    grid, so it could fall between two evaluated frequencies.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    size = int(min(len(x), max(fs / step, 8)))
+    return _frames(x, size, max(size // 2, 1)) * np.hanning(size)
+
+
+def zoom_peak(x, fs, band, num_points=1024):
+    """Peak frequency from zoom FFTs evaluated on `num_points` over `band`."""
+    from scipy.signal import zoom_fft
+
+    step = (band[1] - band[0]) / (num_points - 1)
+    frames = _analysis_frames(x, fs, step)
+    power = np.zeros(num_points)
+    for start in range(0, len(frames), 256):
+        spectrum = zoom_fft(frames[start:start + 256], list(band), m=num_points, fs=fs, endpoint=True, axis=1)
+        power += np.sum(np.abs(spectrum) ** 2, axis=0)
+    mag = np.sqrt(power)
+    k = int(np.argmax(mag))
+    return band[0] + step * (k + float(_parabolic_offset(mag, k)))
+
+
+def goertzel_power(frames, freqs, fs):
+    """
+    Power at each frequency of `freqs` with the Goertzel recursion, summed over the rows of `frames`.
+    The recursion is linear, so its final state s[N-1] - exp(-jw) s[N-2], whose squared
+    magnitude is the power, is the input weighted by exp(-jw (N-1-n)): one product per
+    candidate instead of filtering the whole frame.
+    """
+    frames = np.atleast_2d(np.asarray(frames, dtype=np.float64))
+    n = np.arange(frames.shape[1] - 1, -1, -1)
+    kernel = np.exp(-2j * np.pi * np.outer(n, np.asarray(freqs, dtype=np.float64)) / fs)
+    return np.sum(np.abs(frames @ kernel) ** 2, axis=0)
+
+
+def goertzel_peak(x, fs, candidates):
+    """Strongest of the candidate frequencies, interpolated when they are evenly spaced."""
+    candidates = np.asarray(candidates, dtype=np.float64)
+    step = np.min(np.abs(np.diff(candidates))) if len(candidates) > 1 else fs / len(x)
+    frames = _analysis_frames(x, fs, step)
+    mag = np.sqrt(np.maximum(goertzel_power(frames, candidates, fs), 0))
+    k = int(np.argmax(mag))
+    if len(candidates) > 2 and np.allclose(np.diff(candidates), candidates[1] - candidates[0]):
+        return candidates[k] + (candidates[1] - candidates[0]) * float(_parabolic_offset(mag, k))
+    return candidates[k]
+
+
+@instrument
+def estimate_carrier(x, fs, method="welch", band=None, nperseg=4096, num_points=1024, power=1):
+    """
+    Carrier frequency of `x` with one of the CARRIER_METHODS (`num_points` is
+    the grid of the zoom FFT). With `power` = 2
+    the estimate is made on x**2 and halved, which recovers a suppressed
+    carrier (ASK with a zero-mean baseband) from its line at twice the carrier.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    band = band if band is not None else (0.0, fs / 2)
+    if power != 1:
+        x = x ** power
+        x = x - np.mean(x)
+        band = (band[0] * power, min(band[1] * power, fs / 2))
+    if method == "welch":
+        f = welch_peak(x, fs, nperseg, band)
+    elif method == "zoom":
+        f = zoom_peak(x, fs, band, num_points)
+    elif method == "goertzel":
+        # Refine a coarse Welch peak on a few candidates instead of scanning the band
+        coarse = welch_peak(x, fs, nperseg, band)
+        width = fs / min(nperseg, len(x))
+        lo, hi = max(band[0], coarse - width), min(band[1], coarse + width)
+        f = goertzel_peak(x, fs, np.linspace(lo, hi, GOERTZEL_CANDIDATES))
+    else:
+        raise ValueError(f"Unknown carrier estimation method: {method}")
+    return f / power
+
+
+def track_carrier(x, fs, window_size=4096, hop=None, band=None, nfft=None):
+    """
+    Sliding-window carrier tracking: returns the centre time (s) and the
+    interpolated peak frequency of each frame.
+    """
+    hop = hop or window_size // 2
+    nfft = nfft or window_size
+    frames = _frames(x, window_size, hop)
+    freqs = np.fft.rfftfreq(nfft, 1 / fs)
+    band_slice = _band_slice(freqs, band)
+    window = np.hanning(window_size)
+    estimates = np.empty(len(frames))
+    for start in range(0, len(frames), 256):
+        mag = np.abs(np.fft.rfft(frames[start:start + 256] * window, nfft, axis=1))[:, band_slice]
+        k = np.argmax(mag, axis=1)
+        estimates[start:start + len(mag)] = freqs[band_slice][k] + fs / nfft * _parabolic_offset(mag, k)
+    times = (np.arange(len(frames)) * hop + window_size / 2) / fs
+    return times, estimates
+
+
+class CarrierTracker:
+    """
+    Block-by-block carrier estimation for a streaming receiver: the first
+    block is searched over `band`, the next ones by zoom FFT within
+    `search_width` Hz of the previous estimate.
+    """
+
+    def __init__(self, fs, band=None, search_width=None, num_points=256):
+        self.fs = fs
+        self.band = band if band is not None else (0.0, fs / 2)
+        self.search_width = search_width
+        self.num_points = num_points
+        self.frequency = None
+
+    def update(self, block):
+        if self.frequency is None or self.search_width is None:
+            self.frequency = estimate_carrier(block, self.fs, "welch", self.band, nperseg=min(len(block), 4096))
+        else:
+            lo = max(self.band[0], self.frequency - self.search_width)
+            hi = min(self.band[1], self.frequency + self.search_width)
+            self.frequency = zoom_peak(block, self.fs, (lo, hi), self.num_points)
+        return self.frequency
@@ -0,0 +1,360 @@
+"""
+Headless transmission chain, from the bit sequence to the decided bits.
+
+Every stage of the pages is a plain function here, with no Streamlit or
+matplotlib import, and scipy submodules are only imported inside the stages
+that use them, so batch jobs start in the time it takes to import NumPy.
+The pages are views on top of these functions. `run_chain` strings them
+together and the command line runs it on a bit-sequence file:
+
+    python chain.py binary_sequence_and_period.npz --modulation PSK --noise 0.5
+"""
+import numpy as np
+
+import line_coding
+from bit_sequence import BitSequence, load_bit_sequence
+from precision import PRECISIONS, current, set_precision
+from profiling import instrument, stage
+
+MODULATIONS = ["ASK", "FSK", "PSK"]
+
+
+def samples_per_symbol(Ts, sampling_rate=1000):
+    """Samples in one symbol period of `Ts` ms, rounded to the nearest integer."""
+    return int(round(Ts * sampling_rate / 1000))
+
+
+@instrument
+def generate_sequence(num_bits, period_ms, rng=None):
+    """Random bit sequence with its symbol period."""
+    return BitSequence.random(num_bits, period_ms, rng=rng)
+
+
+@instrument
+def line_code(bits, filter_type="NRZ", hdbn_order=3):
+    """Line-coded symbol levels of `bits` (see `line_coding.LINE_CODES`)."""
+    return line_coding.apply_filter(bits, filter_type, hdbn_order)
+
+
+@instrument
+def filtre_NRZ(signal, Ts, sampling_rate=1000):
+    """Holds +1 for every 1 bit and -1 for any other value over one symbol period."""
+    one = current().dtype.type(1)
+    values = np.where(np.asarray(signal).ravel() == 1, one, -one)
+    return np.repeat(values, samples_per_symbol(Ts, sampling_rate))
+
+
+@instrument
+def filtre_blanch(signal, Ts, sampling_rate=1000):
+    """One +1/-1 impulse at the start of every symbol period, zeros elsewhere."""
+    num_samples_per_period = samples_per_symbol(Ts, sampling_rate)
+    one = current().dtype.type(1)
+    values = np.where(np.asarray(signal).ravel() == 1, one, -one)
+    whitened_signal = np.zeros(len(values) * num_samples_per_period, dtype=values.dtype)
+    if num_samples_per_period:
+        whitened_signal[::num_samples_per_period] = values
+    return whitened_signal
+
+
+@instrument
+def emission_filter(symbols, Ts, sampling_rate=1000, shape="Raised cosine", roll_off=0.25, span=8):
+    """
+    Shapes symbol levels with one of the `pulse_shaping.PULSE_SHAPES`; the
+    pulse of symbol k peaks at sample k * samples_per_symbol.
+    """
+    from pulse_shaping import pulse_taps, shape_symbols
+
+    sps = samples_per_symbol(Ts, sampling_rate)
+    taps, _ = pulse_taps(shape, sps, roll_off, span)
+    # Delayed to the pulse peak, which is not the group delay of the half-sine
+    return shape_symbols(symbols, taps, sps, int(np.argmax(taps)))
+
+
+@instrument
+def filtre_nyquist(signal, Ts, sampling_rate=1000, roll_off=0.25, span=8):
+    """Raised-cosine emission filter of a bit sequence (1 -> +1, 0 -> -1)."""
+    from pulse_shaping import pulse_shape
+
+    return pulse_shape(signal, samples_per_symbol(Ts, sampling_rate), "Raised cosine", roll_off, span)
+
+
+@instrument
+def filtre_adapte(signal, Ts, sampling_rate=1000, roll_off=0.25, span=8):
+    """Root-raised-cosine matched filter, one output sample per symbol."""
+    from pulse_shaping import matched_filter, rrc_taps
+
+    sps = samples_per_symbol(Ts, sampling_rate)
+    return matched_filter(signal, rrc_taps(roll_off, span, sps), sps)
+
+
+@instrument
+def modulate(signal, modulation_type, sampling_rate=1000, f0=250):
+    """
+    ASK multiplies the signal by the carrier, FSK sweeps the frequency from f0
+    (level 0) to 2 * f0 (level 1), PSK shifts the phase by pi times the level.
+    The phases are computed in float64, the output follows the dtype policy.
+    """
+    policy = current()
+    t = np.arange(len(signal)) / sampling_rate
+    if modulation_type == 'ASK':
+        return policy.cast(policy.asarray(signal) * policy.asarray(np.cos(2 * np.pi * f0 * t)))
+    signal = np.asarray(signal, dtype=np.float64)
+    if modulation_type == 'FSK':
+        f1, f2 = f0, 2 * f0
+        return policy.cast(np.cos(2 * np.pi * (f1 * t + (f2 - f1) * np.cumsum(signal) / sampling_rate)))
+    elif modulation_type == 'PSK':
+        return policy.cast(np.cos(2 * np.pi * f0 * t + np.pi * signal))
+    raise ValueError(f"Unsupported modulation type: {modulation_type}")
+
+
+def _mary_pulse(shape, Ts, sampling_rate, roll_off, span):
+    """Samples per symbol, taps, and guard symbols appended so the last pulse ends within the signal."""
+    from pulse_shaping import pulse_taps
+
+    sps = samples_per_symbol(Ts, sampling_rate)
+    taps, _ = pulse_taps(shape, sps, roll_off, span)
+    return sps, taps, -(-(len(taps) - 1) // sps)
+
+
+@instrument
+def modulate_mary(bits, scheme, Ts, sampling_rate=1000, f0=250, shape="Raised cosine", roll_off=0.25, span=8):
+    """
+    M-PSK/M-QAM passband signal of a bit stream (see `mapping.SCHEMES`): the
+    I and Q symbol sequences are shaped with whole pulses, the first one
+    starting at sample 0 and a few guard slots holding the tail of the
+    last, then put on the carrier as I cos - Q sin. A pulse cut at the
+    start would leave a step that the receiver low-pass smears into the
+    first symbol. Returns the signal and the symbols.
+    """
+    from mapping import map_bits
+    from pulse_shaping import shape_symbols
+
+    symbols = map_bits(bits, scheme)
+    sps, taps, guard = _mary_pulse(shape, Ts, sampling_rate, roll_off, span)
+    padded = np.concatenate((symbols, np.zeros(guard, dtype=symbols.dtype)))
+    envelope = shape_symbols(padded.real, taps, sps) + 1j * shape_symbols(padded.imag, taps, sps)
+    t = np.arange(len(envelope)) / sampling_rate
+    return current().cast(np.real(envelope * np.exp(2j * np.pi * f0 * t))), symbols
+
+
+@instrument
+def demodulate_mary(modulated_signal, scheme, carrier_freq, Ts, sampling_rate=1000, shape="Raised cosine",
+                    roll_off=0.25, span=8, noise_var=None, phase=0.0):
+    """
+    Receiver of `modulate_mary`: complex envelope, matched filter for a
+    root-raised-cosine pulse, one sample per symbol, then Gray demapping.
+    Returns (bits, llrs, symbols); the LLRs use `noise_var`, by default
+    measured as the error to the decided points.
+    """
+    from demodulation import mix_to_baseband
+    from mapping import constellation, demap_hard, demap_llr, hard_labels
+    from pulse_shaping import matched_filter
+
+    sps, taps, guard = _mary_pulse(shape, Ts, sampling_rate, roll_off, span)
+    z = mix_to_baseband(modulated_signal, carrier_freq, sampling_rate, carrier_freq) * np.exp(-1j * phase)
+    num_symbols = max(len(z) // sps - guard, 0)
+    if shape == "Root raised cosine":
+        # The matched filter output peaks a whole pulse length after each symbol start
+        symbols = (matched_filter(z.real, taps, sps, len(taps) - 1, num_symbols)
+                   + 1j * matched_filter(z.imag, taps, sps, len(taps) - 1, num_symbols))
+    else:
+        # Sample every pulse at its peak
+        peak = int(np.argmax(taps))
+        symbols = z[peak:peak + num_symbols * sps:sps] / np.max(taps)
+    if noise_var is None:
+        noise_var = max(np.mean(np.abs(symbols - constellation(scheme)[hard_labels(symbols, scheme)]) ** 2), 1e-12)
+    return demap_hard(symbols, scheme), demap_llr(symbols, scheme, noise_var), symbols
+
+
+@instrument
+def add_noise(signal, noise_level=0.1, rng=None, ebn0_db=None, samples_per_bit=1):
+    """
+    Adds white Gaussian noise of standard deviation `noise_level`, or
+    calibrated on the signal power when `ebn0_db` is given.
+    """
+    from channel import awgn
+
+    if ebn0_db is not None:
+        return awgn(signal, ebn0_db=ebn0_db, samples_per_bit=samples_per_bit, rng=rng)
+    return awgn(signal, sigma=noise_level, rng=rng)
+
+
+@instrument
+def coherent_demodulate(modulated_signal, carrier_freq, sampling_rate, numtaps=None):
+    """
+    Coherent ASK receiver: carrier mixing then a zero-phase low-pass
+    (Butterworth, or a linear-phase FIR of `numtaps`), made positive on the
+    first sample.
+    """
+    from scipy.signal import butter, firwin
+
+    from filtering import zero_phase_filter
+
+    policy = current()
+    t = np.arange(len(modulated_signal)) / sampling_rate
+    demodulated_signal = policy.asarray(modulated_signal) * policy.asarray(np.cos(2 * np.pi * carrier_freq * t))
+    cutoff_freq = carrier_freq / (sampling_rate / 2)
+    with stage("filter design"):
+        if numtaps:
+            b, a = firwin(numtaps, cutoff_freq), 1.0
+        else:
+            b, a = butter(5, cutoff_freq)
+    recovered_signal = zero_phase_filter(b, a, demodulated_signal)
+    if recovered_signal[0] < 0:
+        recovered_signal = -recovered_signal
+    return recovered_signal
+
+
+@instrument
+def demodulate(modulated_signal, modulation_type, carrier_freq, sampling_rate=1000, detector=None,
+               Ts=None, phase=None):
+    """I/Q demodulation of any of the MODULATIONS (see `demodulation.demodulate_iq`)."""
+    from demodulation import demodulate_iq
+
+    sps = samples_per_symbol(Ts, sampling_rate) if Ts else None
+    return demodulate_iq(modulated_signal, modulation_type, carrier_freq, sampling_rate, detector,
+                         samples_per_symbol=sps, phase=phase)
+
+
+@instrument
+def decide(signal, Ts, sampling_rate=1000, timing="none", threshold=0.0):
+    """Hard bits, soft values and sampling phases (see `decision.decide`)."""
+    from decision import decide as decide_symbols
+
+    return decide_symbols(signal, samples_per_symbol(Ts, sampling_rate), timing, threshold)
+
+
+@instrument
+def run_chain(bits, Ts, filter_type="NRZ", modulation_type="ASK", noise_level=0.0, sampling_rate=1000,
+              f0=100, shape="Raised cosine", roll_off=0.25, span=8, detector=None, timing="none", rng=None,
+              ebn0_db=None, hdbn_order=3):
+    """
+    Runs the whole chain and returns every stage output in a dict. The line
+    code symbols are shaped at one symbol per `Ts`; ASK carries them as they
+    are, FSK and PSK as 0/1 levels like in `ber.py`. The receiver knows the
+    carrier phase and decides at the symbol centres; `errors` counts the
+    decided levels that differ from the symbols of the line code, over the
+    `compared` symbols after the first.
+    `ebn0_db` sets the noise from the signal energy per information bit
+    instead of `noise_level`.
+    """
+    bits = np.asarray(bits)
+    symbols = line_code(bits, filter_type, hdbn_order)
+    baseband = emission_filter(symbols, Ts, sampling_rate, shape, roll_off, span)
+    modulated = modulate(carrier_levels(baseband, modulation_type), modulation_type, sampling_rate, f0)
+    if ebn0_db is not None:
+        # Energy per information bit: a line code may send several symbols per bit
+        received = add_noise(modulated, rng=rng, ebn0_db=ebn0_db,
+                             samples_per_bit=len(modulated) / max(len(bits), 1))
+    else:
+        received = add_noise(modulated, noise_level, rng) if noise_level else modulated
+    return {
+        "symbols": symbols,
+        "baseband": baseband,
+        "modulated": modulated,
+        "received": received,
+        **receive(received, symbols, Ts, filter_type, modulation_type, sampling_rate, f0, detector, timing,
+                  shape, roll_off, span),
+    }
+
+
+def carrier_levels(baseband, modulation_type):
+    """Levels put on the carrier: ASK takes the baseband as it is, FSK and PSK as 0/1 levels."""
+    return baseband if modulation_type == "ASK" else (baseband + 1) / 2
+
+
+def receive(received, symbols, Ts, filter_type="NRZ", modulation_type="ASK", sampling_rate=1000, f0=100,
+            detector=None, timing="none", shape="Raised cosine", roll_off=0.25, span=8):
+    """
+    Receiver half of `run_chain`: demodulates with the known carrier phase,
+    decides each slot as the nearest symbol level of the line code (binary or
+    ternary), and counts the errors against the line code `symbols`.
+    """
+    from pulse_shaping import pulse_taps
+
+    demodulated = demodulate(received, modulation_type, f0, sampling_rate, detector, Ts, phase=0.0)
+    # Pulses peak at the start of their slot: integrate from half a slot
+    # earlier, the first slot being decided on the half it has
+    sps = samples_per_symbol(Ts, sampling_rate)
+    half = sps // 2
+    head = np.full(half, np.mean(demodulated[:sps - half]) if len(demodulated) else 0.0)
+    padded = np.concatenate((head, demodulated))[:len(demodulated)]
+    _, soft, offsets = decide(padded, Ts, sampling_rate, timing)
+
+    # Integrate-and-dump value of each level: one pulse averaged over its slot
+    taps, _ = pulse_taps(shape, sps, roll_off, span)
+    peak = int(np.argmax(taps))
+    gain = np.sum(taps[max(peak - half, 0):peak - half + sps]) / sps
+    levels = line_coding.symbol_levels(filter_type)
+    expected = carrier_levels(gain * levels, modulation_type)
+    decided_levels = levels[np.searchsorted((expected[1:] + expected[:-1]) / 2, soft)]
+    # The first slot holds only the second half of its pulse, with the
+    # demodulator start-up in it: it is decided but not counted
+    reference = np.asarray(symbols)
+    num = min(len(decided_levels), len(reference))
+    return {
+        "demodulated": demodulated,
+        "decided": (decided_levels > 0).astype(np.int8),
+        "levels": decided_levels,
+        "soft": soft,
+        "offsets": offsets,
+        "compared": max(num - 1, 0),
+        "errors": int(np.count_nonzero(decided_levels[1:num] != reference[1:num]))
+        + abs(len(decided_levels) - len(reference)),
+    }
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    from pulse_shaping import PULSE_SHAPES
+
+    parser = argparse.ArgumentParser(description="Run the transmission chain on a bit-sequence file")
+    parser.add_argument("bits", nargs="?", help=".npz or legacy .txt bit sequence (default: the saved one)")
+    parser.add_argument("--random", type=int, metavar="N", help="use N random bits instead of a file")
+    parser.add_argument("--period-ms", type=float, help="symbol period, overriding the file's")
+    parser.add_argument("--line-code", default="NRZ", choices=line_coding.LINE_CODES)
+    parser.add_argument("--hdbn-order", type=int, default=3)
+    parser.add_argument("--modulation", default="ASK", choices=MODULATIONS)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--ebn0", type=float, help="Eb/N0 (dB) of calibrated noise, overriding --noise")
+    parser.add_argument("--sampling-rate", type=float, default=1000)
+    parser.add_argument("--carrier", type=float, default=100)
+    parser.add_argument("--shape", default="Raised cosine", choices=PULSE_SHAPES)
+    parser.add_argument("--roll-off", type=float, default=0.25)
+    parser.add_argument("--detector")
+    parser.add_argument("--timing", default="none")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--save", metavar="PREFIX", help="save every stage as PREFIX_<stage>.npy")
+    parser.add_argument("--precision", default="float64", choices=PRECISIONS)
+    parser.add_argument("--frac-bits", type=int, default=12, help="fractional bits of the int16 precision")
+    args = parser.parse_args(argv)
+    set_precision(args.precision, args.frac_bits)
+
+    start = time.perf_counter()
+    if args.random:
+        bits = generate_sequence(args.random, args.period_ms or 20, rng=args.seed)
+    else:
+        bits = load_bit_sequence(args.bits)
+    Ts = args.period_ms or bits.period_ms
+    result = run_chain(bits.to_bits(), Ts, args.line_code, args.modulation, args.noise, args.sampling_rate,
+                       args.carrier, args.shape, args.roll_off, detector=args.detector, timing=args.timing,
+                       rng=args.seed, ebn0_db=args.ebn0, hdbn_order=args.hdbn_order)
+    elapsed = time.perf_counter() - start
+
+    if args.save:
+        from signal_io import save_signal
+
+        for name in ("baseband", "modulated", "received", "demodulated"):
+            save_signal(result[name], f"{args.save}_{name}.npy", sampling_rate=args.sampling_rate, Ts=Ts,
+                        carrier_freq=args.carrier, modulation=args.modulation)
+    num_symbols = len(result["symbols"])
+    noise = f"Eb/N0 {args.ebn0:g} dB" if args.ebn0 is not None else f"noise {args.noise:g}"
+    print(f"{len(bits)} bits, {num_symbols} symbols of {Ts:g} ms, {args.line_code}/{args.modulation}, "
+          f"{noise}: {result['errors']} symbol errors "
+          f"({result['errors'] / max(result['compared'], 1):.3e}) in {elapsed:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Channel models: calibrated AWGN, static multipath and block fading.
+
+Every model takes a signal (1-D) or a batch of realizations (2-D,
+realizations x samples) and works on the whole batch in vectorized calls;
+`realizations=n` repeats a 1-D signal into n rows first. The noise level is
+set from the measured power of each row:
+
+- `snr_db`: signal power over noise power per sample;
+- `ebn0_db`: energy per bit (power x samples per bit) over N0, with a noise
+  variance of N0 / 2 per real sample as in `ber.py`.
+
+Random draws come from `np.random.Generator`s. `streams(seed, n)` gives n
+independent streams of one seed by jumping the PCG64 state, so worker k of
+a simulation can take stream k and get the same numbers whatever the
+number of workers.
+"""
+import numpy as np
+
+from precision import current
+from profiling import instrument
+
+CHANNELS = ["AWGN", "Multipath", "Rayleigh", "Rician"]
+
+
+def stream(seed=None, index=0):
+    """Generator of the `index`-th jump of the PCG64 stream of `seed`."""
+    bit_generator = np.random.PCG64(seed)
+    return np.random.Generator(bit_generator.jumped(index) if index else bit_generator)
+
+
+def streams(seed, count):
+    """`count` non-overlapping generators derived from one seed."""
+    return [stream(seed, index) for index in range(count)]
+
+
+def _generator(rng):
+    return rng if isinstance(rng, np.random.Generator) else stream(rng)
+
+
+def _batch(x, realizations):
+    x = np.asarray(x)
+    if realizations is not None:
+        x = np.broadcast_to(x, (realizations,) + x.shape[-1:])
+    return x
+
+
+def noise_sigma(x, snr_db=None, ebn0_db=None, samples_per_bit=1):
+    """
+    Noise standard deviation per sample for every row of `x` (shape
+    (..., 1)), from the row power and either `snr_db` or `ebn0_db`.
+    """
+    power = np.mean(np.abs(x) ** 2, axis=-1, keepdims=True)
+    if snr_db is not None:
+        return np.sqrt(power / 10 ** (snr_db / 10))
+    if ebn0_db is not None:
+        return np.sqrt(power * samples_per_bit / (2 * 10 ** (ebn0_db / 10)))
+    raise ValueError("Give snr_db or ebn0_db")
+
+
+def _gaussian(rng, shape, complex_valued, dtype=np.float64):
+    if complex_valued:
+        # Unit total variance, split between I and Q
+        noise = rng.standard_normal(shape, dtype=dtype) + 1j * rng.standard_normal(shape, dtype=dtype)
+        return noise * dtype(np.sqrt(0.5))
+    return rng.standard_normal(shape, dtype=dtype)
+
+
+@instrument
+def awgn(x, snr_db=None, ebn0_db=None, samples_per_bit=1, sigma=None, realizations=None, rng=None):
+    """
+    Adds white Gaussian noise, calibrated by `snr_db` or `ebn0_db` on each
+    row, or of absolute standard deviation `sigma`. Complex signals get
+    circular noise of the same total variance. The noise is drawn directly
+    in the dtype of the precision policy.
+    """
+    policy = current()
+    x = policy.asarray(_batch(x, realizations))
+    if sigma is None:
+        sigma = noise_sigma(x, snr_db, ebn0_db, samples_per_bit)
+    sigma = np.asarray(sigma, dtype=policy.dtype)
+    return policy.cast(x + sigma * _gaussian(_generator(rng), x.shape, np.iscomplexobj(x), policy.dtype.type))
+
+
+def _convolve(x, h):
+    """Causal convolution of the rows of `x` with the impulse responses `h` (broadcast), same length as `x`."""
+    n = x.shape[-1]
+    size = 1 << int(np.ceil(np.log2(n + h.shape[-1] - 1)))
+    if np.iscomplexobj(x) or np.iscomplexobj(h):
+        y = np.fft.ifft(np.fft.fft(x, size) * np.fft.fft(h, size), size)
+    else:
+        y = np.fft.irfft(np.fft.rfft(x, size) * np.fft.rfft(h, size), size)
+    return y[..., :n]
+
+
+def impulse_response(gains, delays):
+    """FIR of the paths `gains` (last axis) at integer sample `delays`."""
+    gains = np.asarray(gains)
+    delays = np.asarray(delays, dtype=int)
+    h = np.zeros(gains.shape[:-1] + (delays.max() + 1,), dtype=gains.dtype)
+    for path, delay in enumerate(delays):
+        h[..., delay] += gains[..., path]
+    return h
+
+
+def random_paths(num_paths, max_delay, realizations=1, decay=3.0, rng=None):
+    """
+    Gains (realizations x paths) and increasing delays of random static
+    channels with an exponential power-delay profile falling by 1/e every
+    `max_delay / decay` samples, normalized to unit energy per realization.
+    """
+    rng = _generator(rng)
+    delays = np.round(np.linspace(0, max_delay, num_paths)).astype(int)
+    profile = np.exp(-decay * delays / max(max_delay, 1))
+    gains = rng.standard_normal((realizations, num_paths)) * np.sqrt(profile)
+    return gains / np.linalg.norm(gains, axis=-1, keepdims=True), delays
+
+
+@instrument
+def multipath(x, gains, delays, realizations=None):
+    """
+    Static multipath channel: the sum of the paths `gains` delayed by
+    `delays` samples. A 2-D `gains` gives one channel per row of `x`.
+    """
+    x = _batch(x, realizations)
+    return current().cast(_convolve(x, impulse_response(gains, delays)))
+
+
+def fading_gains(num_blocks, realizations=1, k_factor=0.0, rng=None):
+    """
+    Complex gains (realizations x blocks) of unit mean power: Rayleigh for
+    `k_factor` 0, Rician with a line-of-sight path of random phase otherwise.
+    """
+    rng = _generator(rng)
+    shape = (realizations, num_blocks)
+    scattered = _gaussian(rng, shape, True)
+    los = np.exp(2j * np.pi * rng.random((realizations, 1)))
+    return np.sqrt(k_factor / (k_factor + 1)) * los + np.sqrt(1 / (k_factor + 1)) * scattered
+
+
+@instrument
+def block_fading(x, block_length, k_factor=0.0, realizations=None, rng=None):
+    """
+    Flat block fading: every `block_length` samples of every row see one
+    complex gain. A real passband signal keeps real by applying the gain to
+    its analytic signal. Returns the faded signal and the gains.
+    """
+    x = _batch(x, realizations)
+    rows = x.reshape(-1, x.shape[-1])
+    num_blocks = -(-x.shape[-1] // block_length)
+    gains = fading_gains(num_blocks, len(rows), k_factor, rng)
+    per_sample = np.repeat(gains, block_length, axis=-1)[:, :x.shape[-1]]
+    if np.iscomplexobj(x):
+        y = rows * per_sample
+    else:
+        from scipy.signal import hilbert
+
+        y = np.real(hilbert(rows, axis=-1) * per_sample)
+    return current().cast(y.reshape(x.shape)), gains.reshape(x.shape[:-1] + (num_blocks,))
@@ -0,0 +1,134 @@
+"""
+Integrate-and-dump decisions with symbol-timing recovery.
+
+The received signal is viewed as a (symbols x samples) array without copying
+and every bit is decided from one mean per row. Timing recovery works on
+the integrate-and-dump output for every sampling phase at once, which
+comes from a single cumulative sum. `recover_timing` then estimates the
+phase block by block:
+- "early-late" keeps the phase of largest output energy;
+- "gardner" keeps the zero crossing of the Gardner timing error.
+A first-order loop filter smooths the block estimates (an `lfilter` along
+the block axis), so drifting captures are followed without any per-sample
+Python.
+"""
+import numpy as np
+
+from profiling import instrument
+
+TIMING_METHODS = ["none", "gardner", "early-late"]
+
+
+def symbol_view(x, sps, offset=0):
+    """(symbols, sps) view of the full symbol slots of `x` starting at sample `offset`."""
+    x = np.asarray(x)
+    num_symbols = max((len(x) - offset) // sps, 0)
+    return x[offset:offset + num_symbols * sps].reshape(num_symbols, sps)
+
+
+def integrate_and_dump(x, sps, offset=0):
+    """
+    Mean of every symbol slot from sample `offset` on. A last partial slot is
+    averaged as well, as `extract_binary_sequence` always did.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    view = symbol_view(x, sps, offset)
+    soft = view.mean(axis=1)
+    rest = x[offset + view.size:]
+    if len(rest):
+        soft = np.append(soft, rest.mean())
+    return soft
+
+
+def phase_outputs(x, sps):
+    """
+    Integrate-and-dump output for every sampling phase: element [k, tau] is
+    the mean of x[k * sps + tau:(k + 1) * sps + tau].
+    """
+    x = np.asarray(x, dtype=np.float64)
+    cumsum = np.concatenate(([0.0], np.cumsum(x)))
+    windows = (cumsum[sps:] - cumsum[:-sps]) / sps
+    num_symbols = len(windows) // sps
+    return windows[:num_symbols * sps].reshape(num_symbols, sps), windows
+
+
+def _gardner_error(outputs, windows, sps):
+    """Gardner error per symbol and phase: y(k + 1/2) * (y(k) - y(k + 1))."""
+    num_symbols = len(outputs) - 1
+    half = sps // 2
+    mid = windows[half:half + num_symbols * sps].reshape(num_symbols, sps)
+    return mid * (outputs[:-1] - outputs[1:])
+
+
+def _zero_crossing(curves):
+    """
+    Fractional phase of the steepest downward zero crossing of each row of
+    `curves` (the Gardner S-curve is periodic in the phase).
+    """
+    nxt = np.roll(curves, -1, axis=-1)
+    drop = np.where((curves >= 0) & (nxt < 0), curves - nxt, 0.0)
+    tau = np.argmax(drop, axis=-1)
+    rows = np.arange(len(curves))
+    e0, e1 = curves[rows, tau], nxt[rows, tau]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(e0 > e1, e0 / (e0 - e1), 0.0)
+    return tau + frac
+
+
+def _energy_peak(curves):
+    """Fractional phase of the maximum of each row of `curves`, by parabolic interpolation."""
+    sps = curves.shape[-1]
+    tau = np.argmax(curves, axis=-1)
+    rows = np.arange(len(curves))
+    a, b, c = (curves[rows, (tau + d) % sps] for d in (-1, 0, 1))
+    denom = a - 2 * b + c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(denom < 0, 0.5 * (a - c) / denom, 0.0)
+    return tau + frac
+
+
+@instrument
+def recover_timing(x, sps, method="gardner", block_symbols=256, loop_gain=0.25):
+    """
+    Sampling phase (in samples, within [0, sps)) of every block of
+    `block_symbols` symbols. The per-phase timing curves of consecutive
+    blocks are smoothed with gain `loop_gain` (1 keeps each block on its own).
+    """
+    from scipy.signal import lfilter
+
+    if method not in TIMING_METHODS[1:]:
+        raise ValueError(f"Unknown timing recovery method: {method}")
+    outputs, windows = phase_outputs(x, sps)
+    if method == "gardner":
+        per_symbol = _gardner_error(outputs, windows, sps)
+    else:
+        per_symbol = outputs ** 2
+    if not len(per_symbol):
+        return np.zeros(1)
+    num_blocks = -(-len(per_symbol) // block_symbols)
+    padded = np.zeros((num_blocks * block_symbols, sps))
+    padded[:len(per_symbol)] = per_symbol
+    counts = np.minimum(block_symbols, len(per_symbol) - np.arange(num_blocks) * block_symbols)
+    curves = padded.reshape(num_blocks, block_symbols, sps).sum(axis=1) / counts[:, None]
+    curves = lfilter([loop_gain], [1.0, loop_gain - 1.0], curves, axis=0, zi=(1 - loop_gain) * curves[:1])[0]
+    tau = _zero_crossing(curves) if method == "gardner" else _energy_peak(curves)
+    return np.mod(tau, sps)
+
+
+@instrument
+def decide(x, sps, timing="none", threshold=0.0, block_symbols=256, loop_gain=0.25):
+    """
+    Hard bits, soft values (integrate-and-dump means) and the sampling phase
+    of every block. Without timing recovery the slots start at sample 0 and
+    the result equals the legacy per-bit loop.
+    """
+    if timing in (None, "none"):
+        soft = integrate_and_dump(x, sps)
+        offsets = np.zeros(1)
+    else:
+        offsets = recover_timing(x, sps, timing, block_symbols, loop_gain)
+        outputs, _ = phase_outputs(x, sps)
+        phase = np.repeat(np.round(offsets).astype(int) % sps, block_symbols)[:len(outputs)]
+        soft = outputs[np.arange(len(outputs)), phase]
+    bits = (soft > threshold).astype(np.int8)
+    return bits, soft, offsets
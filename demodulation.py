@@ -0,0 +1,125 @@
+"""
+I/Q demodulation of the ASK, FSK and PSK signals of page 4.
+
+The capture is mixed to complex baseband in one pass: the local oscillator
+exp(-j 2 pi f t) is computed once for the capture length, multiplied into
+every row and the product low-pass filtered by `fir_filter`. Detection then
+works on the complex envelope:
+
+- ASK: "coherent" projection on the carrier phase, or "envelope" magnitude;
+- FSK: "discriminator" (phase difference between samples, giving the
+  instantaneous frequency), or "correlator" comparing the energy of the two
+  tones over one symbol;
+- PSK: "phase" of the envelope against the carrier phase.
+
+Captures may be 1-D or 2-D (captures x samples); batches are demodulated
+in the same vectorized calls and every row gets its own phase reference.
+"""
+import numpy as np
+
+from filtering import fir_filter
+from precision import current
+from profiling import instrument, stage
+
+DETECTORS = {
+    "ASK": ["coherent", "envelope"],
+    "FSK": ["discriminator", "correlator"],
+    "PSK": ["phase"],
+}
+
+
+def local_oscillator(num_samples, freq, sampling_rate):
+    """exp(-j 2 pi freq t) over `num_samples` samples, in the complex dtype of the policy."""
+    t = np.arange(num_samples) / sampling_rate
+    return np.exp(-2j * np.pi * freq * t).astype(current().complex_dtype, copy=False)
+
+
+def mix_to_baseband(x, freq, sampling_rate, cutoff, numtaps=101):
+    """
+    Complex envelope of the rows of `x` around `freq`: mixing with the local
+    oscillator, then a zero-phase windowed-sinc low-pass at `cutoff` Hz. The
+    factor 2 gives a real carrier A cos(2 pi f t + phi) the envelope A exp(j phi).
+    """
+    from scipy.signal import firwin
+
+    x = current().asarray(x)
+    with stage("filter design"):
+        taps = firwin(numtaps, min(cutoff, 0.99 * sampling_rate / 2), fs=sampling_rate)
+    with stage("mixing"):
+        mixed = x * local_oscillator(x.shape[-1], freq, sampling_rate)
+        mixed *= 2
+    return fir_filter(taps, mixed, zero_phase=True)
+
+
+def carrier_phase(z, order=2):
+    """
+    Carrier phase of every row of the envelope `z`, from the `order`-th power
+    that removes the binary modulation (defined modulo 2 pi / order).
+    """
+    return np.angle(np.sum(z ** order, axis=-1, keepdims=True)) / order
+
+
+def _resolve_polarity(y, sign_of_first=1):
+    """Flips the rows whose first sample does not have the sign `sign_of_first`, as `demodulate` does."""
+    flip = np.sign(y[..., :1]) == -sign_of_first
+    return np.where(flip, -y, y)
+
+
+def _moving_sum(z, length):
+    """Centred sum over `length` samples along the last axis."""
+    return fir_filter(np.ones(length), z, zero_phase=True)
+
+
+@instrument
+def demodulate_iq(x, modulation_type, carrier_freq, sampling_rate=1000, detector=None, f2=None,
+                  samples_per_symbol=None, cutoff=None, numtaps=101, phase=None):
+    """
+    Demodulates the rows of `x` modulated as in `modulate_signal` with carrier
+    `carrier_freq` (the lower tone f1 for FSK, the upper one being `f2`,
+    2 * f1 by default). Returns the recovered modulating signal, same shape
+    as `x`:
+
+    - ASK: the amplitude, made positive on the first sample when `phase` is
+      not given (the "envelope" detector is always positive);
+    - FSK: (f - f1) / (f2 - f1) for the instantaneous frequency f, so the
+      0/1 levels come back as 0/1; the "correlator" needs
+      `samples_per_symbol` and returns a value in [0, 1];
+    - PSK: the phase over pi, wrapped to [-0.5, 1.5) so the 0/1 levels come
+      back as 0/1; the first sample is taken as level 0 when `phase` is not
+      given.
+    """
+    detector = detector or DETECTORS.get(modulation_type, [None])[0]
+    if detector not in DETECTORS.get(modulation_type, []):
+        raise ValueError(f"Unsupported detector {detector!r} for modulation type {modulation_type!r}")
+    x = current().asarray(x)
+
+    if modulation_type == "FSK":
+        f1 = carrier_freq
+        f2 = 2 * f1 if f2 is None else f2
+        center = (f1 + f2) / 2
+        z = mix_to_baseband(x, center, sampling_rate, cutoff or abs(f2 - f1), numtaps)
+        if detector == "discriminator":
+            dphi = np.angle(z[..., 1:] * np.conj(z[..., :-1]))
+            dphi = np.concatenate((dphi[..., :1], dphi), axis=-1)
+            freq = center + dphi * sampling_rate / (2 * np.pi)
+            return current().cast((freq - f1) / (f2 - f1))
+        if not samples_per_symbol:
+            raise ValueError("The FSK correlator needs samples_per_symbol")
+        rotation = local_oscillator(x.shape[-1], (f2 - f1) / 2, sampling_rate)
+        e1 = np.abs(_moving_sum(z / rotation, samples_per_symbol)) ** 2
+        e2 = np.abs(_moving_sum(z * rotation, samples_per_symbol)) ** 2
+        return current().cast(e2 / np.maximum(e1 + e2, np.finfo(e1.dtype).tiny))
+
+    z = mix_to_baseband(x, carrier_freq, sampling_rate, cutoff or carrier_freq, numtaps)
+    if detector == "envelope":
+        return current().cast(np.abs(z))
+    reference = carrier_phase(z) if phase is None else phase
+    z = z * np.exp(-1j * np.asarray(reference)).astype(z.dtype)
+    if modulation_type == "ASK":
+        y = np.real(z)
+        return current().cast(_resolve_polarity(y) if phase is None else y)
+    # PSK: wrapping away from 0 and pi keeps noisy samples of both levels apart
+    level = np.mod(np.angle(z) + np.pi / 2, 2 * np.pi) / np.pi - 0.5
+    if phase is None:
+        level = np.where(level[..., :1] > 0.5, np.mod(level + 1.5, 2) - 0.5, level)
+    return current().cast(level)
@@ -0,0 +1,142 @@
+"""
+Eye diagrams and constellations as 2-D histograms.
+
+Overlaying one line per symbol costs a matplotlib artist per trace; here the
+signal is folded by sampling phase instead and every (phase, amplitude) point
+is counted into a fixed grid with `np.bincount`. The grid is drawn as one
+image, so rendering time depends on its size only. Both views accumulate
+block by block (`update`), so a long capture can be read in pieces and the
+view built up as it goes.
+"""
+import numpy as np
+
+
+def _bin_indices(values, lo, hi, bins):
+    """Bin of every value in [lo, hi) over `bins` bins, -1 outside."""
+    index = np.floor((values - lo) * (bins / (hi - lo))).astype(np.intp)
+    return np.where((index >= 0) & (index < bins), index, -1)
+
+
+def _range(values, margin=0.1):
+    lo, hi = float(np.min(values)), float(np.max(values))
+    pad = margin * (hi - lo) or 1.0
+    return lo - pad, hi + pad
+
+
+class EyeDiagram:
+    """
+    Eye diagram of a signal with `sps` samples per symbol. Consecutive
+    samples are joined by `oversample` linearly interpolated points, as the
+    traces of a line plot would be. `offset` is the sampling phase (sample
+    index modulo sps) of the symbol instants, which end up at x = 0 and 1.
+    `y_range` is fixed on the first block when not given.
+    """
+
+    def __init__(self, sps, bins=200, y_range=None, oversample=4, offset=0):
+        self.sps = int(sps)
+        self.bins = bins
+        self.y_range = y_range
+        self.oversample = oversample
+        self.offset = offset
+        self.counts = np.zeros((self.sps * oversample, bins), dtype=np.int64)
+        self.num_samples = 0
+        self._previous = None
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        if not len(block):
+            return self
+        if self.y_range is None:
+            self.y_range = _range(block)
+        start = self.num_samples
+        x = block
+        if self._previous is not None:
+            x = np.concatenate(([self._previous], block))
+            start -= 1
+        self._previous = block[-1]
+        self.num_samples += len(block)
+        if len(x) < 2:
+            return self
+
+        u = self.oversample
+        points = x[:-1, None] + np.diff(x)[:, None] * (np.arange(u) / u)
+        phase = np.round(start + np.arange(len(x) - 1) - self.offset).astype(np.intp) % self.sps
+        columns = phase[:, None] * u + np.arange(u)
+        rows = _bin_indices(points, *self.y_range, self.bins)
+        valid = rows >= 0
+        flat = columns[valid] * self.bins + rows[valid]
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        return self
+
+    def image(self, symbols=2):
+        """
+        Counts (amplitude bins x columns) over `symbols` symbol periods from
+        half a period before a symbol instant, and the x extent in symbols.
+        """
+        half = self.counts.shape[0] // 2
+        period = np.roll(self.counts, half, axis=0)
+        return np.tile(period, (symbols, 1)).T, (-0.5, symbols - 0.5)
+
+    def plot(self, ax, symbols=2, cmap="magma"):
+        counts, (x0, x1) = self.image(symbols)
+        ax.imshow(np.log1p(counts), origin="lower", aspect="auto", cmap=cmap, interpolation="nearest",
+                  extent=(x0, x1, *self.y_range))
+        ax.set_xlabel("Time (symbols)")
+        ax.set_ylabel("Amplitude")
+        return ax
+
+
+class ConstellationDensity:
+    """
+    Density of complex symbols over a square grid of `bins` x `bins`
+    covering +/- `extent` on both axes (fixed on the first block when not
+    given).
+    """
+
+    def __init__(self, bins=200, extent=None):
+        self.bins = bins
+        self.extent = extent
+        self.counts = np.zeros((bins, bins), dtype=np.int64)
+        self.num_symbols = 0
+
+    def update(self, symbols):
+        symbols = np.asarray(symbols).ravel()
+        if not len(symbols):
+            return self
+        if self.extent is None:
+            self.extent = 1.2 * max(np.max(np.abs(symbols.real)), np.max(np.abs(symbols.imag)), 1e-12)
+        i = _bin_indices(symbols.real, -self.extent, self.extent, self.bins)
+        q = _bin_indices(symbols.imag, -self.extent, self.extent, self.bins)
+        valid = (i >= 0) & (q >= 0)
+        flat = i[valid] * self.bins + q[valid]
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        self.num_symbols += len(symbols)
+        return self
+
+    def plot(self, ax, cmap="magma"):
+        e = self.extent or 1.0
+        ax.imshow(np.log1p(self.counts).T, origin="lower", aspect="equal", cmap=cmap, interpolation="nearest",
+                  extent=(-e, e, -e, e))
+        ax.set_xlabel("In-phase")
+        ax.set_ylabel("Quadrature")
+        return ax
+
+
+def eye_diagram(x, sps, offset=0, block_size=1 << 18, **options):
+    """Eye diagram of a whole signal, accumulated `block_size` samples at a time."""
+    eye = EyeDiagram(sps, offset=offset, **options)
+    if options.get("y_range") is None and len(x):
+        eye.y_range = _range(x)
+    for start in range(0, len(x), block_size):
+        eye.update(x[start:start + block_size])
+    return eye
+
+
+def constellation_density(symbols, block_size=1 << 18, **options):
+    """Constellation density of a whole symbol sequence, accumulated block by block."""
+    density = ConstellationDensity(**options)
+    if options.get("extent") is None and len(symbols):
+        density.extent = 1.2 * max(np.max(np.abs(np.real(symbols))), np.max(np.abs(np.imag(symbols))), 1e-12)
+    for start in range(0, len(symbols), block_size):
+        density.update(symbols[start:start + block_size])
+    return density
@@ -0,0 +1,195 @@
+"""
+Parameter-grid experiments over the headless chain.
+
+`run_grid` runs the chain of `chain.run_chain` for every point of line codes
+x symbol periods (Ts, ms) x pulse shapes x modulations x noise levels, on
+the same random bits. Points that differ only downstream share their
+upstream results: the line codes are computed once, and each task takes one
+(line code, Ts, shape) group, shapes its symbols once, modulates them once
+per modulation and runs only the noise, demodulation and decisions per noise
+level. Groups are spread over a process pool as in `ber.py`, with one noise
+generator per point spawned from a single `SeedSequence`, so the results do
+not depend on the number of workers.
+
+Every point gives one row: its parameters and
+- occupied_bandwidth_hz: band holding 99 % of the power of the modulated
+  signal (Welch PSD);
+- papr_db: peak-to-average power ratio of the modulated signal;
+- compared_symbols, symbol_errors, symbol_error_rate: decided levels
+  against the line code symbols, as counted by `run_chain`. The unit is the
+  line code symbol, not the bit: Manchester and Miller send two symbols per
+  bit and HDBN a varying number, so one bit can count up to two errors and
+  the rates of different line codes compare symbols of different lengths;
+- supported: whether the receiver decides every symbol right without noise.
+  The integrate-and-dump receiver does not suit every line code, pulse and
+  modulation at every symbol period (too few carrier cycles per symbol,
+  too much intersymbol interference); the symbol errors of such points
+  would say nothing about the noise, so they are NaN;
+- runtime_s: time of the stages of the point itself; upstream_s: time of the
+  upstream stages it shares with the other points of its group.
+
+The rows are stored as a Parquet table, read back as a pandas DataFrame:
+
+    python experiments.py --line-codes NRZ Manchester --ts 10 20 --noise 0 0.5 1 --out grid.parquet
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import chain
+from periodogram import occupied_bandwidth, welch_psd
+
+PARAMETERS = ["line_code", "Ts_ms", "shape", "modulation", "noise_level"]
+
+
+def papr_db(x):
+    """Peak-to-average power ratio (dB)."""
+    power = np.abs(np.asarray(x, dtype=np.float64)) ** 2
+    mean = np.mean(power) if len(power) else 0.0
+    return float(10 * np.log10(np.max(power) / mean)) if mean > 0 else 0.0
+
+
+def run_group(line_code, symbols, line_code_s, Ts, shape, modulations, noise_levels, seeds, sampling_rate=1000,
+              f0=100, roll_off=0.25, span=8, detector=None, timing="none", fraction=0.99):
+    """
+    Runs every (modulation, noise level) point of one (line code, Ts, shape)
+    group, `seeds` giving the noise seed of each point in that order.
+    """
+    start = time.perf_counter()
+    baseband = chain.emission_filter(symbols, Ts, sampling_rate, shape, roll_off, span)
+    shaping_s = time.perf_counter() - start
+    seeds = iter(seeds)
+    rows = []
+    for modulation in modulations:
+        start = time.perf_counter()
+        modulated = chain.modulate(chain.carrier_levels(baseband, modulation), modulation, sampling_rate, f0)
+        modulation_s = time.perf_counter() - start
+        freqs, psd = welch_psd(modulated, sampling_rate)
+        bandwidth = occupied_bandwidth(freqs, psd, fraction)
+        papr = papr_db(modulated)
+        # Noise-free reference run, telling whether the point is supported
+        start = time.perf_counter()
+        clean = chain.receive(modulated, symbols, Ts, line_code, modulation, sampling_rate, f0, detector, timing,
+                              shape, roll_off, span)
+        clean_s = time.perf_counter() - start
+        supported = clean["errors"] == 0
+        for noise_level in noise_levels:
+            rng = np.random.default_rng(next(seeds))
+            start = time.perf_counter()
+            if noise_level:
+                received = chain.add_noise(modulated, noise_level, rng)
+                result = chain.receive(received, symbols, Ts, line_code, modulation, sampling_rate, f0, detector,
+                                       timing, shape, roll_off, span)
+                runtime_s = time.perf_counter() - start
+            else:
+                result, runtime_s = clean, clean_s
+            errors = result["errors"] if supported else np.nan
+            rows.append({
+                "line_code": line_code,
+                "Ts_ms": float(Ts),
+                "shape": shape,
+                "modulation": modulation,
+                "noise_level": float(noise_level),
+                "occupied_bandwidth_hz": bandwidth,
+                "papr_db": papr,
+                "compared_symbols": result["compared"],
+                "symbol_errors": errors,
+                "symbol_error_rate": errors / max(result["compared"], 1),
+                "supported": supported,
+                "runtime_s": runtime_s,
+                "upstream_s": line_code_s + shaping_s + modulation_s,
+            })
+    return rows
+
+
+def _run_group(args):
+    group, options = args
+    return run_group(*group, **options)
+
+
+def run_grid(line_codes=("NRZ",), Ts=(20,), shapes=("Raised cosine",), modulations=tuple(chain.MODULATIONS),
+             noise_levels=(0.0,), num_bits=1000, seed=0, workers=None, **options):
+    """
+    Runs every point of the grid, in parallel when `workers` > 1, and
+    returns one row per point in grid order (see the module docstring).
+    `options` go to `run_group` (sampling_rate, f0, roll_off, ...).
+    """
+    bits_seed, noise_seed = np.random.SeedSequence(seed).spawn(2)
+    bits = np.random.default_rng(bits_seed).integers(0, 2, num_bits, dtype=np.int8)
+    per_group = len(modulations) * len(noise_levels)
+    groups = [(code, float(ts), shape) for code in line_codes for ts in Ts for shape in shapes]
+    seeds = noise_seed.spawn(len(groups) * per_group)
+
+    coded = {}
+    for code in line_codes:
+        start = time.perf_counter()
+        coded[code] = (chain.line_code(bits, code), time.perf_counter() - start)
+    tasks = [((code, *coded[code], ts, shape, modulations, noise_levels, seeds[i * per_group:(i + 1) * per_group]),
+              options) for i, (code, ts, shape) in enumerate(groups)]
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1:
+        results = [_run_group(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_group, tasks))
+    rows = [row for group in results for row in group]
+    for row in rows:
+        row.update(num_bits=num_bits, seed=seed)
+    return rows
+
+
+def save_results(rows, path):
+    """Writes the rows as a Parquet table (pandas with pyarrow) and returns the path."""
+    import pandas as pd
+
+    pd.DataFrame(rows).to_parquet(path, index=False)
+    return path
+
+
+def load_results(path):
+    """Reads a Parquet table, or a directory of them, as a DataFrame."""
+    import pandas as pd
+
+    return pd.read_parquet(path)
+
+
+def format_table(rows):
+    """Formats the grid rows as a text table."""
+    lines = [f"{'code':<11}{'Ts':>6} {'shape':<19}{'mod':<5}{'noise':>6}{'OBW Hz':>9}{'PAPR dB':>9}"
+             f"{'sym err':>8}{'SER':>10}{'ms':>8}"]
+    for r in rows:
+        lines.append(f"{r['line_code']:<11}{r['Ts_ms']:>6g} {r['shape']:<19}{r['modulation']:<5}"
+                     f"{r['noise_level']:>6g}{r['occupied_bandwidth_hz']:>9.1f}{r['papr_db']:>9.2f}"
+                     f"{r['symbol_errors']:>8g}{r['symbol_error_rate']:>10.3e}{r['runtime_s'] * 1e3:>8.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from line_coding import LINE_CODES
+    from pulse_shaping import PULSE_SHAPES
+
+    parser = argparse.ArgumentParser(description="Run the chain over a parameter grid")
+    parser.add_argument("--line-codes", nargs="+", default=["NRZ"], choices=LINE_CODES)
+    parser.add_argument("--ts", nargs="+", type=float, default=[20], help="symbol periods (ms)")
+    parser.add_argument("--shapes", nargs="+", default=["Raised cosine"], choices=PULSE_SHAPES)
+    parser.add_argument("--modulations", nargs="+", default=chain.MODULATIONS, choices=chain.MODULATIONS)
+    parser.add_argument("--noise", nargs="+", type=float, default=[0.0])
+    parser.add_argument("--num-bits", type=int, default=1000)
+    parser.add_argument("--sampling-rate", type=float, default=1000)
+    parser.add_argument("--carrier", type=float, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", metavar="PATH", help="write the rows to this Parquet file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = run_grid(args.line_codes, args.ts, args.shapes, args.modulations, args.noise, args.num_bits, args.seed,
+                    args.workers, sampling_rate=args.sampling_rate, f0=args.carrier)
+    print(format_table(rows))
+    print(f"{len(rows)} points in {time.perf_counter() - start:.1f} s")
+    if args.out:
+        print(f"Saved to {save_results(rows, args.out)}")
@@ -0,0 +1,297 @@
+"""
+Continuous (live) mode of the transmission chain.
+
+An asyncio producer running in a background thread generates random bits
+without end and pushes them block by block through the generators of
+`streaming` (line coding, emission filter, modulation, noise, coherent
+demodulation, decisions). Each block is scheduled at the target sample
+rate, from the samples it actually produced (a line code may send several
+symbols per bit). When processing falls behind by more than a block, the
+late blocks are dropped (never generated) and counted, so the stream keeps
+real time.
+
+The last `seconds` of every signal stage are kept in fixed-size ring
+buffers that a view can read at any time (`snapshot`). The time spent in
+each stage per block is recorded, as well as the decision delay (how far
+the decided symbols lag the coded ones, mostly the look-ahead of the
+forward-backward receive filter).
+
+The producer thread takes the precision policy of the thread that created
+the chain: every tapped stage output is cast to it. A view keeps the chain
+alive by calling `touch`; with `idle_timeout` set, the producer stops by
+itself once nobody has touched it for that long after the warm-up (the
+page was left or the tab closed).
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+import streaming
+from precision import current, set_precision
+
+# Signal stages kept in ring buffers, in chain order
+TAPS = ["baseband", "modulated", "received", "demodulated"]
+
+
+class RingBuffer:
+    """Last `capacity` samples written, safe to read from another thread."""
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def write(self, block):
+        block = np.asarray(block)
+        with self._lock:
+            # Only the last `capacity` samples of a long block are kept
+            end = self.total + len(block)
+            block = block[-self.capacity:]
+            start = (end - len(block)) % self.capacity
+            head = min(len(block), self.capacity - start)
+            self._data[start:start + head] = block[:head]
+            self._data[:len(block) - head] = block[head:]
+            self.total = end
+
+    def snapshot(self):
+        """Copy of the buffered samples, oldest first."""
+        with self._lock:
+            if self.total < self.capacity:
+                return self._data[:self.total].copy()
+            start = self.total % self.capacity
+            return np.concatenate((self._data[start:], self._data[:start]))
+
+
+class StageTimes:
+    """Time spent in each stage per block, excluding its upstream stages."""
+
+    def __init__(self):
+        self.upstream = 0.0
+        self.clear()
+
+    def clear(self):
+        self.last = {}
+        self.total = {}
+        self.peak = {}
+        self.count = {}
+
+    def record(self, name, seconds):
+        self.last[name] = seconds
+        self.total[name] = self.total.get(name, 0.0) + seconds
+        self.peak[name] = max(self.peak.get(name, 0.0), seconds)
+        self.count[name] = self.count.get(name, 0) + 1
+
+    def rows(self):
+        return [{"stage": name, "blocks": self.count[name], "last_ms": self.last[name] * 1e3,
+                 "mean_ms": self.total[name] / self.count[name] * 1e3, "max_ms": self.peak[name] * 1e3}
+                for name in self.count]
+
+
+def _timed(name, blocks, times):
+    """Yields the blocks of a stage generator, recording its own time per block."""
+    blocks = iter(blocks)
+    while True:
+        outer, times.upstream = times.upstream, 0.0
+        start = time.perf_counter()
+        try:
+            block = next(blocks)
+        except StopIteration:
+            return
+        inclusive = time.perf_counter() - start
+        times.record(name, inclusive - times.upstream)
+        times.upstream = outer + inclusive
+        yield block
+
+
+def _tapped(blocks, buffer, policy):
+    for block in blocks:
+        block = policy.cast(block)
+        buffer.write(block)
+        yield block
+
+
+class LiveChain:
+    """
+    Endless chain at `target_rate` samples/s (the sampling rate by default,
+    i.e. real time; higher for soak tests), `block_bits` bits per block.
+    The carrier (twice `f0` for FSK) must stay below the Nyquist frequency.
+    """
+
+    def __init__(self, Ts=20, filter_type="NRZ", modulation_type="ASK", noise_level=0.1, sampling_rate=1000,
+                 f0=250, block_bits=8, seconds=10.0, target_rate=None, seed=None, idle_timeout=None):
+        highest = 2 * f0 if modulation_type == "FSK" else f0
+        if not 0 < highest < sampling_rate / 2:
+            raise ValueError(f"The {modulation_type} carrier at {f0} Hz needs a sampling rate above "
+                             f"{2 * highest} Hz")
+        self.Ts = Ts
+        self.filter_type = filter_type
+        self.modulation_type = modulation_type
+        self.noise_level = noise_level
+        self.sampling_rate = sampling_rate
+        self.f0 = f0
+        self.block_bits = block_bits
+        self.target_rate = target_rate or sampling_rate
+        self.samples_per_symbol = int(Ts * sampling_rate / 1000)
+        self.idle_timeout = idle_timeout
+        self.precision = current()
+        self.buffers = {name: RingBuffer(seconds * sampling_rate, self.precision.dtype) for name in TAPS}
+        self.times = StageTimes()
+        self._reset()
+        self.error = None
+        self._rng = np.random.default_rng(seed)
+        self._running = False
+        self._thread = None
+        self._touched = time.monotonic()
+
+    def _bits(self):
+        while True:
+            bits = self._rng.integers(0, 2, self.block_bits, dtype=np.int8)
+            yield bits
+
+    def _reset(self):
+        """Zeroes the counters of a new pipeline."""
+        self.blocks_done = 0
+        self.blocks_dropped = 0
+        self.bits_sent = 0
+        self.symbols_sent = 0
+        self.symbols_decided = 0
+        self.samples_sent = 0
+        self._warmup_samples = 0
+        self.started = None
+        self.times.clear()
+
+    def _counted(self, blocks, counter):
+        """Adds the length of every block to the `counter` attribute."""
+        for block in blocks:
+            setattr(self, counter, getattr(self, counter) + len(block))
+            yield block
+
+    def _block_period(self):
+        """Mean time of one block at the target rate, from the samples produced so far."""
+        blocks = self.blocks_done or 1
+        samples = self.samples_sent - self._warmup_samples if self.blocks_done else 0
+        return (samples / blocks or self.block_bits * self.samples_per_symbol) / self.target_rate
+
+    def pipeline(self):
+        """The chain as generators, timed per stage and tapped into the ring buffers."""
+        t = self.times
+        policy = self.precision
+        blocks = _timed("line code", streaming.stream_line_code(self._counted(self._bits(), "bits_sent"),
+                                                                  self.filter_type), t)
+        blocks = self._counted(blocks, "symbols_sent")
+        blocks = _timed("emission filter", streaming.stream_filtre_nyquist(
+            streaming.stream_filtre_NRZ(blocks, self.Ts, self.sampling_rate), self.Ts, self.sampling_rate), t)
+        blocks = self._counted(_tapped(blocks, self.buffers["baseband"], policy), "samples_sent")
+        blocks = _timed("modulate", streaming.stream_modulate(blocks, self.modulation_type, self.sampling_rate,
+                                                                self.f0), t)
+        blocks = _tapped(blocks, self.buffers["modulated"], policy)
+        if self.noise_level:
+            blocks = _timed("add noise", streaming.stream_add_noise(blocks, self.noise_level, self._rng), t)
+        blocks = _tapped(blocks, self.buffers["received"], policy)
+        blocks = _timed("demodulate", streaming.stream_demodulate(blocks, self.f0, self.sampling_rate), t)
+        blocks = _tapped(blocks, self.buffers["demodulated"], policy)
+        return _timed("decide", streaming.stream_extract_binary_sequence(blocks, self.Ts / 1000,
+                                                                         self.sampling_rate), t)
+
+    async def run(self):
+        """Produces blocks on schedule until `stop`."""
+        loop = asyncio.get_running_loop()
+        self._reset()
+        decided = self.pipeline()
+        # Warm-up (imports, filter design) before the clock and the idle timer start
+        self.symbols_decided += len(next(decided))
+        self.times.clear()
+        self._warmup_samples = self.samples_sent
+        self.touch()
+        self.started = loop.time()
+        deadline = self.started
+        while self._running:
+            if self.idle_timeout is not None and time.monotonic() - self._touched > self.idle_timeout:
+                self._running = False
+                break
+            period = self._block_period()
+            late = int((loop.time() - deadline) // period)
+            if late > 0:
+                # Keep real time: the blocks that could not be made in time are skipped
+                self.blocks_dropped += late
+                deadline += late * period
+            target = self.bits_sent + self.block_bits
+            produced = self.samples_sent
+            while self.bits_sent < target:
+                self.symbols_decided += len(next(decided))
+            self.blocks_done += 1
+            deadline += (self.samples_sent - produced) / self.target_rate
+            await asyncio.sleep(max(deadline - loop.time(), 0))
+
+    def _main(self):
+        set_precision(self.precision)
+        try:
+            asyncio.run(self.run())
+        except Exception as e:
+            self.error = e
+            self._running = False
+
+    def touch(self):
+        """Marks the chain as still watched (see `idle_timeout`)."""
+        self._touched = time.monotonic()
+
+    def start(self):
+        self.touch()
+        if not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._main, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def snapshot(self):
+        """Copies of the ring buffers, oldest sample first."""
+        return {name: buffer.snapshot() for name, buffer in self.buffers.items()}
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        return {
+            "blocks": self.blocks_done,
+            "dropped": self.blocks_dropped,
+            "samples_per_s": (self.samples_sent - self._warmup_samples) / elapsed if elapsed else 0.0,
+            "target_rate": self.target_rate,
+            "symbols_decided": self.symbols_decided,
+            "decision_delay_s": (self.symbols_sent - self.symbols_decided) * self.Ts / 1000,
+            "stages": self.times.rows(),
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the live chain and print its statistics")
+    parser.add_argument("--seconds", type=float, default=5.0, help="how long to run")
+    parser.add_argument("--speed", type=float, default=1.0, help="target rate as a multiple of real time")
+    parser.add_argument("--modulation", default="ASK")
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--carrier", type=float, default=125, help="carrier frequency (Hz), sampled at 1 kHz")
+    args = parser.parse_args()
+
+    live = LiveChain(modulation_type=args.modulation, noise_level=args.noise, f0=args.carrier,
+                     target_rate=1000 * args.speed)
+    live.start()
+    time.sleep(args.seconds)
+    live.stop()
+    stats = live.stats()
+    print(f"{stats['blocks']} blocks, {stats['dropped']} dropped, {stats['samples_per_s']:.0f} samples/s "
+          f"(target {stats['target_rate']:.0f}), {stats['symbols_decided']} symbols decided, "
+          f"decision delay {stats['decision_delay_s']:.2f} s")
+    for row in stats["stages"]:
+        print(f"  {row['stage']:<16}{row['mean_ms']:8.3f} ms mean {row['max_ms']:8.3f} ms max")
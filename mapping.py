@@ -0,0 +1,167 @@
+"""
+Gray-coded M-PSK / square M-QAM mapping and demapping.
+
+Each scheme is a table of complex points of unit mean energy indexed by the
+k-bit label of the point (MSB first), so mapping is one table lookup per
+symbol. Labels are read straight from the packed bit stream of a
+`BitSequence`: whole groups of bytes (1 byte for k = 2, 4, 8; 3 bytes for
+k = 3, 6) are turned into integers and split with shifts.
+
+The demapper works on each axis separately for QAM (I and Q are
+independent Gray-coded PAMs): hard decisions are a rounding of the scaled
+coordinate and max-log LLRs only compare against the sqrt(M) levels of one
+axis. PSK decisions round the phase to the nearest sector.
+"""
+import math
+
+import numpy as np
+
+from profiling import instrument
+
+# name -> (family, number of points)
+SCHEMES = {
+    "QPSK": ("PSK", 4),
+    "8-PSK": ("PSK", 8),
+    "16-QAM": ("QAM", 16),
+    "64-QAM": ("QAM", 64),
+}
+
+
+def gray(n):
+    return n ^ (n >> 1)
+
+
+def bits_per_symbol(scheme):
+    return SCHEMES[scheme][1].bit_length() - 1
+
+
+def _pam_levels(num_levels):
+    """Levels -L+1, -L+3, ..., L-1 of one QAM axis and the Gray label of each."""
+    index = np.arange(num_levels)
+    return (2 * index - num_levels + 1).astype(np.float64), gray(index)
+
+
+def _qam_scale(num_points):
+    """Mean energy of the unscaled square QAM."""
+    return np.sqrt(2 * (num_points - 1) / 3)
+
+
+def constellation(scheme):
+    """Complex points of `scheme`, element `label` being the point of that label."""
+    family, num_points = SCHEMES[scheme]
+    points = np.empty(num_points, dtype=np.complex128)
+    if family == "PSK":
+        index = np.arange(num_points)
+        points[gray(index)] = np.exp(1j * (2 * np.pi * index + np.pi) / num_points)
+    else:
+        side = math.isqrt(num_points)
+        half = bits_per_symbol(scheme) // 2
+        levels, labels = _pam_levels(side)
+        points[(labels[:, None] << half) | labels[None, :]] = (levels[:, None] + 1j * levels[None, :])
+        points /= _qam_scale(num_points)
+    return points
+
+
+def labels_from_bits(bits, k):
+    """Integer labels of the k-bit groups of a 0/1 array (zero-padded to whole symbols)."""
+    bits = np.asarray(bits, dtype=np.uint8).ravel()
+    num_symbols = -(-len(bits) // k)
+    groups = np.zeros((num_symbols, k), dtype=np.uint8)
+    groups.ravel()[:len(bits)] = bits
+    return (np.packbits(groups, axis=1)[:, 0] >> (8 - k)).astype(np.intp)
+
+
+def labels_from_packed(packed, num_bits, k):
+    """Integer labels of the k-bit groups of a packed (np.packbits) bit stream."""
+    packed = np.asarray(packed, dtype=np.uint8)
+    group = math.lcm(k, 8) // 8
+    num_symbols = -(-num_bits // k)
+    padded = np.zeros(-(-len(packed) // group) * group, dtype=np.uint32)
+    padded[:len(packed)] = packed
+    words = padded.reshape(-1, group) << (8 * np.arange(group - 1, -1, -1, dtype=np.uint32))
+    words = np.bitwise_or.reduce(words, axis=1)
+    shifts = (k * np.arange(8 * group // k - 1, -1, -1)).astype(np.uint32)
+    labels = (words[:, None] >> shifts) & np.uint32((1 << k) - 1)
+    return labels.ravel()[:num_symbols].astype(np.intp)
+
+
+@instrument
+def map_bits(bits, scheme):
+    """
+    Complex symbols of a bit stream: a `BitSequence` (read packed) or an
+    array of 0/1. The last symbol is zero-padded.
+    """
+    k = bits_per_symbol(scheme)
+    if hasattr(bits, "packed"):
+        labels = labels_from_packed(bits.packed, bits.num_bits, k)
+    else:
+        labels = labels_from_bits(bits, k)
+    return constellation(scheme)[labels]
+
+
+def _label_bits(labels, k):
+    """(symbols, k) 0/1 array of the labels, MSB first."""
+    shifts = np.arange(k - 1, -1, -1)
+    return ((labels[..., None] >> shifts) & 1).astype(np.int8)
+
+
+def hard_labels(symbols, scheme):
+    """Label of the nearest constellation point of every symbol."""
+    family, num_points = SCHEMES[scheme]
+    symbols = np.asarray(symbols)
+    if family == "PSK":
+        sector = np.round((np.angle(symbols) * num_points - np.pi) / (2 * np.pi)).astype(np.intp)
+        return gray(sector % num_points)
+    side = math.isqrt(num_points)
+    scaled = symbols * _qam_scale(num_points)
+    index_i = np.clip(np.round((scaled.real + side - 1) / 2), 0, side - 1).astype(np.intp)
+    index_q = np.clip(np.round((scaled.imag + side - 1) / 2), 0, side - 1).astype(np.intp)
+    return (gray(index_i) << (bits_per_symbol(scheme) // 2)) | gray(index_q)
+
+
+@instrument
+def demap_hard(symbols, scheme):
+    """Minimum-distance bit decisions, (symbols x k) flattened to one 0/1 stream."""
+    return _label_bits(hard_labels(symbols, scheme), bits_per_symbol(scheme)).reshape(-1)
+
+
+def _max_log(distances, label_bits, noise_var):
+    """
+    Max-log LLR of every label bit from the squared `distances` (..., points)
+    to points whose labels have the bits `label_bits` (points, bits).
+    """
+    llr = np.empty(distances.shape[:-1] + (label_bits.shape[1],))
+    for j in range(label_bits.shape[1]):
+        ones = label_bits[:, j] == 1
+        llr[..., j] = (distances[..., ones].min(axis=-1) - distances[..., ~ones].min(axis=-1)) / noise_var
+    return llr
+
+
+@instrument
+def demap_llr(symbols, scheme, noise_var=1.0, block=1 << 18):
+    """
+    Max-log LLRs log(P(b = 0) / P(b = 1)) of every bit, flattened like
+    `demap_hard`; `noise_var` is E|n|^2 of the complex noise per symbol.
+    Symbols are processed `block` at a time to bound the temporary arrays.
+    """
+    family, num_points = SCHEMES[scheme]
+    k = bits_per_symbol(scheme)
+    symbols = np.asarray(symbols).ravel()
+    llr = np.empty((len(symbols), k))
+    if family == "QAM":
+        half = k // 2
+        levels, labels = _pam_levels(math.isqrt(num_points))
+        levels = levels / _qam_scale(num_points)
+        label_bits = _label_bits(labels, half)
+    else:
+        points = constellation(scheme)
+        label_bits = _label_bits(np.arange(num_points), k)
+    for start in range(0, len(symbols), block):
+        z = symbols[start:start + block]
+        if family == "QAM":
+            # Each axis carries half of the label bits: I the MSBs, Q the LSBs
+            llr[start:start + block, :half] = _max_log((z.real[:, None] - levels) ** 2, label_bits, noise_var)
+            llr[start:start + block, half:] = _max_log((z.imag[:, None] - levels) ** 2, label_bits, noise_var)
+        else:
+            llr[start:start + block] = _max_log(np.abs(z[:, None] - points) ** 2, label_bits, noise_var)
+    return llr.reshape(-1)
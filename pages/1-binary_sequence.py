@@ -2,6 +2,9 @@ import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
 
+from bit_sequence import BitSequence
+from utils import export_artifacts_sidebar, precision_sidebar, profiled, pyplot, session_artifacts
+
 class BinaryTransmissionApp:
     def __init__(self):
         st.title("Binary Transmission")
@@ -40,11 +43,12 @@ class BinaryTransmissionApp:
         binary_sequence = self.binary_sequence_input
         period_ms = self.period_ms_input
 
-        if not binary_sequence or not binary_sequence.isdigit():
+        if not binary_sequence or set(binary_sequence) - {'0', '1'}:
             st.error("Please enter a valid binary sequence.")
             return
 
-        binary_sequence = [int(bit) for bit in binary_sequence]
+        bits = BitSequence.from_string(binary_sequence, period_ms)
+        binary_sequence = bits.to_bits()
 
         # Create time array for binary sequence
         t = np.arange(0, len(binary_sequence) * period_ms, period_ms)
@@ -72,14 +76,15 @@ class BinaryTransmissionApp:
         axs[1].set_ylim(-0.1, 1.1)
 
         # Show plots
-        st.pyplot(fig)
+        pyplot(fig)
 
-        # Save binary sequence and period to a text file
-        data = np.column_stack((binary_sequence, np.full_like(binary_sequence, period_ms)))
-        np.savetxt('binary_sequence_and_period.txt', data, fmt='%d %.2f', header='Binary Sequence   Period (ms)', comments='')
+        # Hand the sequence to the next pages of this session
+        session_artifacts().put_bit_sequence(bits)
 
 def main():
     app = BinaryTransmissionApp()
+    export_artifacts_sidebar(session_artifacts())
 
 if __name__ == "__main__":
-    main()
+    precision_sidebar()
+    profiled(main)
@@ -1,100 +1,58 @@
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.signal import welch, firwin, lfilter
+
+from chain import filtre_blanch
+from periodogram import welch_psd
+from plotting import plot_decimated
+from pulse_shaping import PULSE_SHAPES, pulse_shape
+from stage_cache import cached_stage
+from utils import export_artifacts_sidebar, precision_sidebar, profiled, pyplot, session_artifacts, time_range_slider
 
 def getsignal_ts():
-    filename = "binary_sequence_and_period.txt"
     try:
-        with open(filename, 'r') as file:
-            lines = file.readlines()[1:]  # Skip the first line (header)
-            binary_sequence = []
-            periods = []
-            for line in lines:
-                try:
-                    value, period = line.split()
-                    binary_sequence.append(int(value))
-                    periods.append(float(period))
-                except ValueError:
-                    st.warning(f"Skipping line with invalid format: {line.strip()}")
+        binary_sequence = session_artifacts().bit_sequence()
     except Exception as e:
         st.error(f"An error occurred while reading the file: {e}")
         return [], 0
+    return binary_sequence, binary_sequence.period_ms
 
-    if len(set(periods)) == 1:
-        return binary_sequence, periods[0]  # Return the sequence and the consistent period
-    else:
-        st.error("The periods in the file are not consistent.")
-        return [], 0
-
-def filtre_NRZ(signal, Ts, sampling_rate=1000):
-    num_samples_per_period = int(Ts * sampling_rate / 1000)
-    nrz_signal = np.repeat(signal, num_samples_per_period)
-    return nrz_signal
-
-def nyquist_filter(binary_data, T_s):
+@cached_stage
+def nyquist_filter(binary_data, T_s, shape="Half-sine", roll_off=0.25, span=8):
     samples_per_bit = int(1 / T_s)
     t = np.linspace(0, len(binary_data) * T_s, len(binary_data) * samples_per_bit)
-    y = np.zeros(len(t))
-    
-    # Define a small sinusoidal wave function
-    def sinusoidal_wave(x, amplitude, frequency):
-        return amplitude * np.sin(2 * np.pi * frequency * x)
-    
-    for i, bit in enumerate(binary_data):
-        start_idx = i * samples_per_bit
-        end_idx = (i + 1) * samples_per_bit
-        t_bit = np.linspace(0, T_s, samples_per_bit)
-        frequency = 1 / (2 * T_s)  # Frequency to get a single period within one bit duration
-        
-        if bit == 1:
-            y[start_idx:end_idx] = sinusoidal_wave(t_bit, amplitude=1, frequency=frequency)
-        elif bit == 0:
-            y[start_idx:end_idx] = sinusoidal_wave(t_bit, amplitude=-1, frequency=frequency)
-
+    y = pulse_shape(binary_data, samples_per_bit, shape, roll_off, span)
     return t, y
 
 def calculate_dsp(signal, sampling_rate=1000):
-    freqs, psd = welch(signal, fs=sampling_rate, nperseg=1024, return_onesided=False)
-    return freqs, psd
-
-def filtre_blanch(signal, Ts, sampling_rate=1000):
-    num_samples_per_period = int(Ts * sampling_rate / 1000)
-    whitened_signal = np.zeros(len(signal) * num_samples_per_period)
-    for i, bit in enumerate(signal):
-        if bit == 1:
-            whitened_signal[i * num_samples_per_period] = 1
-        else:
-            whitened_signal[i * num_samples_per_period] = -1
-    return whitened_signal
+    # Two-sided running Welch, frequencies in increasing order
+    return welch_psd(signal, sampling_rate, 1024, onesided=False)
 
-def plot_signals(signal, Ts, sampling_rate=1000):
-    nrz_signal = filtre_NRZ(signal, Ts, sampling_rate)
+def plot_signals(signal, Ts, sampling_rate=1000, shape="Half-sine", roll_off=0.25, span=8):
     white = filtre_blanch(signal, Ts, sampling_rate)
-    t_nyquist, nyquist_signal = nyquist_filter(signal, Ts / 1000.0)
+    t_nyquist, nyquist_signal = nyquist_filter(signal, Ts / 1000.0, shape, roll_off, span)
 
     freqs, psd = calculate_dsp(nyquist_signal, sampling_rate)
 
-    total_duration_ms = len(white) * (1000 / sampling_rate)
-    t = np.linspace(0, total_duration_ms / 1000, len(white))
+    time_range = time_range_slider(len(white) / sampling_rate)
 
     # Plot the whitening filter
     fig, ax = plt.subplots(figsize=(10, 4))
-    ax.plot(t, white, label='Whitened Signal', color='blue')
+    plot_decimated(ax, white, dt=1 / sampling_rate, time_range=time_range, label='Whitened Signal', color='blue')
     ax.set_xlabel('Time (s)')
     ax.set_ylabel('Amplitude')
     ax.set_title('Whitening Filter')
     ax.legend()
-    st.pyplot(fig)
+    pyplot(fig)
 
     # Plot the Nyquist filter
     fig, ax = plt.subplots(figsize=(10, 4))
-    ax.plot(t_nyquist, nyquist_signal, label='Nyquist Signal', color='green')
+    plot_decimated(ax, nyquist_signal, t=t_nyquist, time_range=time_range, label='Nyquist Signal', color='green')
     ax.set_xlabel('Time (s)')
     ax.set_ylabel('Amplitude')
     ax.set_title('Nyquist Filter')
     ax.legend()
-    st.pyplot(fig)
+    pyplot(fig)
 
     # Plot the DSP of the Nyquist signal
     fig, ax = plt.subplots(figsize=(10, 4))
@@ -103,14 +61,14 @@ def plot_signals(signal, Ts, sampling_rate=1000):
     ax.set_ylabel('Power Spectral Density (dB/Hz)')
     ax.set_title('Nyquist Signal DSP')
     ax.legend()
-    st.pyplot(fig)
+    pyplot(fig)
 
-    # Save Nyquist signal to a file
-    filename = "nyquist_signal.txt"
-    np.savetxt(filename, nyquist_signal, fmt='%f', header="Nyquist Signal")
+    # Hand the Nyquist signal to the next pages of this session
+    session_artifacts().put("nyquist_signal", nyquist_signal, sampling_rate=sampling_rate, Ts=Ts)
 
 
 
+precision_sidebar()
 signal, Ts = getsignal_ts()
 
 if not signal or not Ts:
@@ -118,5 +76,9 @@ if not signal or not Ts:
     Ts = st.number_input("Period of the Square Wave (ms)", min_value=1, value=100, step=1)
     signal = [int(bit) for bit in signal.split(',')]
 st.title("filtre d'emission")
+shape = st.selectbox("Pulse shape", PULSE_SHAPES)
+roll_off = st.slider("Roll-off", 0.0, 1.0, 0.25, 0.05, disabled=shape == "Half-sine")
+span = st.number_input("Filter span (symbols)", min_value=2, max_value=64, value=8, step=2, disabled=shape == "Half-sine")
 # Plot the signals and DSP
-plot_signals(signal, Ts)
+profiled(lambda: plot_signals(signal, Ts, shape=shape, roll_off=roll_off, span=span))
+export_artifacts_sidebar(session_artifacts())
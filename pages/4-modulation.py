@@ -1,91 +1,78 @@
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.signal import welch, firwin, lfilter
+
+import chain
+from mapping import SCHEMES
+from periodogram import spectrogram, welch_psd
+from plotting import plot_decimated
+from stage_cache import cached_stage
+from utils import (
+    export_artifacts_sidebar, plot_spectrogram, precision_sidebar, profiled, pyplot,
+    session_artifacts, spectral_settings, time_range_slider,
+)
 
 st.set_option('deprecation.showPyplotGlobalUse', False)
 
 def read_signal_from_file(filename):
     """Reads the signal from a file."""
     try:
-        with open(filename, 'r') as file:
-            lines = file.readlines()
-            signal_data = np.array([float(line.strip()) for line in lines if not line.startswith("#")])
+        signal_data, _ = session_artifacts().signal(filename)
         return signal_data
     except Exception as e:
         st.error(f"An error occurred while reading the file: {e}")
         return np.array([])
 
-def plot_signal(signal, title="Signal", sampling_rate=1000):
-    total_duration_ms = len(signal) * (1000 / sampling_rate)
-    t = np.linspace(0, total_duration_ms / 1000, len(signal))
-
+def plot_signal(signal, title="Signal", sampling_rate=1000, time_range=None):
     fig, ax = plt.subplots(figsize=(8, 6))
-    ax.plot(t, signal, label=title, color='green')
+    plot_decimated(ax, signal, dt=1 / sampling_rate, time_range=time_range, label=title, color='green')
     ax.set_xlabel('Time (s)')
     ax.set_ylabel('Amplitude')
     ax.set_title(title)
     ax.legend()
     ax.grid(True)
 
-    st.pyplot(fig)
+    pyplot(fig)
 
 def getsignal_ts():
-    filename = "binary_sequence_and_period.txt"
     try:
-        with open(filename, 'r') as file:
-            lines = file.readlines()[1:]  # Skip the first line (header)
-            binary_sequence = []
-            periods = []
-            for line in lines:
-                try:
-                    value, period = line.split()
-                    binary_sequence.append(int(value))
-                    periods.append(float(period))
-                except ValueError:
-                    st.warning(f"Skipping line with invalid format: {line.strip()}")
+        binary_sequence = session_artifacts().bit_sequence()
     except Exception as e:
         st.error(f"An error occurred while reading the file: {e}")
         return [], 0
+    return binary_sequence, binary_sequence.period_ms
 
-    if len(set(periods)) == 1:
-        return binary_sequence, periods[0]  # Return the sequence and the consistent period
-    else:
-        st.error("The periods in the file are not consistent.")
-        return [], 0
-
-def filtre_NRZ(signal, Ts, sampling_rate=1000):
-    num_samples_per_period = int(Ts * sampling_rate / 1000)
-    nrz_signal = np.zeros(len(signal) * num_samples_per_period)
-    for i, bit in enumerate(signal):
-        value = 1 if bit == 1 else -1
-        nrz_signal[i * num_samples_per_period:(i + 1) * num_samples_per_period] = value
-    return nrz_signal
-
-def filtre_nyquist(signal, Ts, sampling_rate=1000):
-    num_samples_per_period = int(Ts * sampling_rate / 1000)
-    roll_off = 0.25
-    nyquist_filter = firwin(numtaps=101, cutoff=1.0 / num_samples_per_period, window=('kaiser', roll_off))
-    nyquist_signal = lfilter(nyquist_filter, 1.0, signal)
-    return nyquist_signal
-
+@cached_stage
 def modulate_signal(signal, modulation_type, sampling_rate=1000, f0=250):
-    t = np.arange(len(signal)) / sampling_rate
-    if modulation_type == 'ASK':
-        modulated_signal = signal * np.cos(2 * np.pi * f0 * t)
-    elif modulation_type == 'FSK':
-        f1, f2 = f0, 2 * f0
-        modulated_signal = np.cos(2 * np.pi * (f1 * t + (f2 - f1) * np.cumsum(signal) / sampling_rate))
-    elif modulation_type == 'PSK':
-        modulated_signal = np.cos(2 * np.pi * f0 * t + np.pi * signal)
-    else:
+    try:
+        return chain.modulate(signal, modulation_type, sampling_rate, f0)
+    except ValueError:
         st.error("Unsupported modulation type selected.")
         return np.zeros_like(signal)
-    return modulated_signal
 
-def calculate_dsp(signal, sampling_rate=1000):
-    freqs, psd = welch(signal, fs=sampling_rate, nperseg=1024)
-    return freqs, psd
+@cached_stage
+def modulate_mary_signal(bits, scheme, Ts, sampling_rate=1000, f0=250):
+    return chain.modulate_mary(bits, scheme, Ts, sampling_rate, f0)
+
+def plot_constellation(symbols, title="Constellation"):
+    fig, ax = plt.subplots(figsize=(6, 6))
+    ax.scatter(symbols.real[:10000], symbols.imag[:10000], s=4, color='green')
+    ax.set_xlabel('In-phase')
+    ax.set_ylabel('Quadrature')
+    ax.set_title(title)
+    ax.set_aspect('equal')
+    ax.grid(True)
+
+    pyplot(fig)
+
+@cached_stage
+def calculate_dsp(signal, sampling_rate=1000, nperseg=1024, overlap=0.5, window="hann"):
+    # Running Welch over blocks of the signal
+    return welch_psd(signal, sampling_rate, nperseg, overlap, window)
+
+@cached_stage
+def calculate_spectrogram(signal, sampling_rate=1000, nperseg=1024, overlap=0.5, window="hann"):
+    return spectrogram(signal, sampling_rate, nperseg, overlap, window)
 
 def plot_dsp(freqs, psd, title="Power Spectral Density"):
     fig, ax = plt.subplots(figsize=(8, 6))
@@ -96,13 +83,14 @@ def plot_dsp(freqs, psd, title="Power Spectral Density"):
     ax.legend()
     ax.grid(True)
 
-    st.pyplot(fig)
+    pyplot(fig)
 
 def main():
     st.title("Nyquist Signal Viewer and Modulation")
+    export_artifacts_sidebar(session_artifacts())
     
     # Read Nyquist signal from file
-    nyquist_signal_filename = "nyquist_signal.txt"
+    nyquist_signal_filename = "nyquist_signal.npy"
     nyquist_signal = read_signal_from_file(nyquist_signal_filename)
     
     if nyquist_signal.size == 0:
@@ -116,29 +104,43 @@ def main():
         st.error("Error loading signal data.")
         return
 
+    time_range = time_range_slider(len(nyquist_signal) / 1000)
+
     # Plot the Nyquist signal
     st.subheader("Nyquist Signal")
-    plot_signal(nyquist_signal, title="Nyquist Signal")
+    plot_signal(nyquist_signal, title="Nyquist Signal", time_range=time_range)
 
     # Normalize the Nyquist signal to ensure it fits within the expected amplitude range
-    nyquist_signal /= np.max(np.abs(nyquist_signal))
+    nyquist_signal = nyquist_signal / np.max(np.abs(nyquist_signal))
 
-    modulation_type = st.selectbox("Choose Modulation Type", ["ASK", "FSK", "PSK"])
+    modulation_type = st.selectbox("Choose Modulation Type", chain.MODULATIONS + list(SCHEMES))
 
-    if modulation_type:
+    if modulation_type in SCHEMES:
+        # M-ary schemes map the bit sequence itself, k bits per symbol
+        modulated_signal, symbols = modulate_mary_signal(signal, modulation_type, Ts)
+        st.subheader(f"{modulation_type} Constellation")
+        plot_constellation(symbols, title=f"{modulation_type} Constellation")
+    elif modulation_type:
         modulated_signal = modulate_signal(nyquist_signal, modulation_type)
-
+    if modulation_type:
         st.subheader(f"{modulation_type} Modulated Signal")
-        plot_signal(modulated_signal, title=f"{modulation_type} Modulated Signal")
+        plot_signal(modulated_signal, title=f"{modulation_type} Modulated Signal", time_range=time_range)
+
+        # Hand the modulated signal to the next pages of this session
+        session_artifacts().put(f"modulated_signal_{modulation_type}", modulated_signal, sampling_rate=1000, Ts=Ts, carrier_freq=250,
+                    modulation=modulation_type)
 
-        # Save the modulated signal to a file
-        modulated_filename = f"modulated_signal_{modulation_type}.txt"
-        np.savetxt(modulated_filename, modulated_signal, fmt='%f', header=f"{modulation_type} Modulated Signal")
+        settings = spectral_settings()
+        freqs, psd = calculate_dsp(modulated_signal, **settings)
 
-        freqs, psd = calculate_dsp(modulated_signal)
+        st.subheader(f"{modulation_type} Spectrum")
+        plot_dsp(freqs, psd, title=f"{modulation_type} Power Spectral Density")
 
-        st.subheader(f"{modulation_type} ")
-        # plot_dsp(freqs, psd, title=f"{modulation_type} Power Spectral Density")
+        fig, ax = plt.subplots(figsize=(8, 6))
+        plot_spectrogram(ax, *calculate_spectrogram(modulated_signal, **settings))
+        ax.set_title(f"{modulation_type} Spectrogram")
+        pyplot(fig)
 
 if __name__ == "__main__":
-    main()
+    precision_sidebar()
+    profiled(main)
@@ -1,58 +1,108 @@
 import streamlit as st
-import numpy as np
 import matplotlib.pyplot as plt
-from scipy.signal import welch
+import numpy as np
+
+from chain import add_noise, samples_per_symbol
+from channel import CHANNELS, block_fading, multipath, random_paths
+from periodogram import spectrogram, welch_psd
+from plotting import plot_decimated
+from utils import (
+    export_artifacts_sidebar, plot_spectrogram, precision_sidebar, profiled, pyplot,
+    session_artifacts, spectral_settings, time_range_slider,
+)
 
 st.set_option('deprecation.showPyplotGlobalUse', False)
 
-def plot_signal(signal, title="Signal"):
+def plot_signal(signal, title="Signal", time_range=None):
     sampling_rate = 1000  # Assuming a sampling rate of 1000 Hz
-    total_duration_ms = len(signal) * (1000 / sampling_rate)
-    t = np.linspace(0, total_duration_ms / 1000, len(signal))
 
     fig, ax = plt.subplots(figsize=(8, 6))
-    ax.plot(t, signal, label=title)
+    plot_decimated(ax, signal, dt=1 / sampling_rate, time_range=time_range, label=title)
     ax.set_xlabel('Time (s)')
     ax.set_ylabel('Amplitude')
     ax.set_title(title)
     ax.legend()
     ax.grid(True)
 
-    st.pyplot(fig)
+    pyplot(fig)
 
-def add_noise(signal, noise_level=0.1):
-    noise = np.random.normal(0, noise_level, len(signal))
-    noisy_signal = signal + noise
-    return noisy_signal
+def apply_channel(signal, model, metadata, seed):
+    """Passes the signal through the selected channel model; returns it with the model parameters."""
+    if model == "Multipath":
+        num_paths = st.slider("Paths", 2, 8, 3)
+        max_delay = st.slider("Delay spread (samples)", 1, 100, 10)
+        gains, delays = random_paths(num_paths, max_delay, rng=seed)
+        st.write("Path gains:", dict(zip(delays.tolist(), np.round(gains[0], 3).tolist())))
+        return multipath(signal, gains[0], delays), {"path_gains": gains[0].tolist(), "path_delays": delays.tolist()}
+    if model in ("Rayleigh", "Rician"):
+        k_factor = st.slider("Rician K factor", 0.1, 20.0, 3.0, 0.1) if model == "Rician" else 0.0
+        block_ms = st.slider("Coherence time (ms)", 10, 2000, 200, 10)
+        block_length = max(int(block_ms * metadata.get("sampling_rate", 1000) / 1000), 1)
+        faded, gains = block_fading(signal, block_length, k_factor, rng=seed)
+        return faded, {"k_factor": k_factor, "block_length": block_length}
+    return signal, {}
 
 def main():
     st.title("Read Modulated Signal and Add Noise")
+    export_artifacts_sidebar(session_artifacts())
 
     # File name for the modulated signal
-    filename = "modulated_signal_ASK.txt"
+    filename = "modulated_signal_ASK.npy"
 
     try:
-        modulated_signal = np.loadtxt(filename)
+        modulated_signal, metadata = session_artifacts().signal(filename)
+        time_range = time_range_slider(len(modulated_signal) / 1000)
         st.subheader("Original Modulated Signal")
-        plot_signal(modulated_signal, title="Original Modulated Signal")
+        plot_signal(modulated_signal, title="Original Modulated Signal", time_range=time_range)
 
-        # Adjust the noise level
-        noise_level = st.slider("Noise Level", 0.0, 1.0, 0.01, 0.001)
+        # Channel model before the noise
+        model = st.selectbox("Channel", ["None"] + CHANNELS[1:])
+        seed = st.sidebar.number_input("Channel seed", min_value=0, value=0, step=1)
+        channel_signal, channel_info = apply_channel(modulated_signal, model, metadata, seed)
 
-        # Add noise to the modulated signal with the selected noise level
-        noisy_signal = add_noise(modulated_signal, noise_level=noise_level)
+        # Adjust the noise level, absolute or from Eb/N0
+        calibrated = st.checkbox("Set the noise by Eb/N0", False)
+        if calibrated:
+            ebn0_db = st.slider("Eb/N0 (dB)", -5.0, 30.0, 10.0, 0.5)
+            samples_per_bit = samples_per_symbol(metadata.get("Ts", 20), metadata.get("sampling_rate", 1000))
+            noisy_signal = add_noise(channel_signal, rng=seed, ebn0_db=ebn0_db, samples_per_bit=samples_per_bit)
+            noise_level = float(np.std(noisy_signal - channel_signal))
+            label = f"Eb/N0: {ebn0_db} dB"
+        else:
+            noise_level = st.slider("Noise Level", 0.0, 1.0, 0.01, 0.001)
+            noisy_signal = add_noise(channel_signal, noise_level=noise_level, rng=seed)
+            label = f"Noise Level: {noise_level}"
 
         st.subheader("Noisy Modulated Signal")
-        plot_signal(noisy_signal, title=f"Noisy Modulated Signal (Noise Level: {noise_level})")
+        plot_signal(noisy_signal, title=f"Noisy Modulated Signal ({model}, {label})", time_range=time_range)
+
+        # Spectra of the capture before and after the channel
+        settings = spectral_settings()
+        fig, ax = plt.subplots(figsize=(8, 5))
+        for label, x in (("Original", modulated_signal), ("Noisy", noisy_signal)):
+            freqs, psd = welch_psd(x, metadata.get("sampling_rate", 1000), **settings)
+            ax.semilogy(freqs, psd, label=label)
+        ax.set_xlabel('Frequency (Hz)')
+        ax.set_ylabel('Power/Frequency (V**2/Hz)')
+        ax.set_title("Power Spectral Density")
+        ax.legend()
+        ax.grid(True)
+        pyplot(fig)
+
+        fig, ax = plt.subplots(figsize=(8, 5))
+        plot_spectrogram(ax, *spectrogram(noisy_signal, metadata.get("sampling_rate", 1000), **settings))
+        ax.set_title("Noisy Signal Spectrogram")
+        pyplot(fig)
 
-        # Save the noisy signal to a file
-        noisy_filename = f"noisy_modulated_signal_{noise_level:.2f}.txt"
-        np.savetxt(noisy_filename, noisy_signal, fmt='%f', header=f"Noisy Modulated Signal (Noise Level: {noise_level})")
+        # Hand the noisy signal to the next pages of this session, replacing the previous run's
+        session_artifacts().put("noisy_modulated_signal", noisy_signal, noise_level=noise_level, channel=model,
+                                **channel_info, **metadata)
         #st.markdown(f"Download Noisy Modulated Signal: [Noisy Modulated Signal]({noisy_filename})")
     except Exception as e:
         st.error(f"An error occurred while reading the file: {e}")
 
 if __name__ == "__main__":
-    main()
+    precision_sidebar()
+    profiled(main)
 
 #nyquist_with_nrz_and_addnoise
\ No newline at end of file
@@ -1,152 +1,132 @@
-import numpy as np
-from scipy.signal import firwin, lfilter, butter, filtfilt
-from scipy.fftpack import fft, fftfreq
 import streamlit as st
+import numpy as np
 import matplotlib.pyplot as plt
 
-st.set_option('deprecation.showPyplotGlobalUse', False)
+from carrier import CARRIER_METHODS, estimate_carrier
+from chain import demodulate, demodulate_mary, samples_per_symbol
+from demodulation import DETECTORS
+from density import constellation_density, eye_diagram
+from mapping import SCHEMES
+from plotting import plot_decimated
+from stage_cache import cached_stage
+from utils import export_artifacts_sidebar, precision_sidebar, profiled, pyplot, session_artifacts, time_range_slider
 
-def modulate(signal, carrier_freq, sampling_rate):
-    t = np.arange(len(signal)) / sampling_rate
-    carrier = np.cos(2 * np.pi * carrier_freq * t)
-    modulated_signal = signal * carrier
-    return modulated_signal
+st.set_option('deprecation.showPyplotGlobalUse', False)
 
-def demodulate(modulated_signal, carrier_freq, sampling_rate):
-    t = np.arange(len(modulated_signal)) / sampling_rate
-    carrier = np.cos(2 * np.pi * carrier_freq * t)
-    demodulated_signal = modulated_signal * carrier
-    
-    # Apply low-pass filter to recover the baseband signal
-    nyquist_rate = sampling_rate / 2
-    cutoff_freq = carrier_freq / nyquist_rate
-    b, a = butter(5, cutoff_freq)
-    recovered_signal = filtfilt(b, a, demodulated_signal)
-    
-    # Normalize to ensure the recovered signal starts with positive or negative value correctly
-    if recovered_signal[0] < 0:
-        recovered_signal = -recovered_signal
-    
-    return recovered_signal
-
-def detect_carrier_frequency(signal, sampling_rate):
-    # Compute the FFT of the signal
-    N = len(signal)
-    fft_signal = fft(signal)
-    fft_magnitude = np.abs(fft_signal)
-    
-    # Compute the frequency bins
-    frequencies = fftfreq(N, d=1/sampling_rate)
-    
-    # Find the peak frequency
-    peak_index = np.argmax(fft_magnitude[:N // 2])  # Only consider positive frequencies
-    peak_frequency = frequencies[peak_index]
-    
-    return peak_frequency
+@cached_stage
+def demodulate_capture(modulated_signal, modulation_type, carrier_freq, sampling_rate, detector, Ts):
+    # Complex-baseband receiver for any of the page 4 modulations
+    return demodulate(modulated_signal, modulation_type, carrier_freq, sampling_rate, detector, Ts)
+
+@cached_stage
+def detect_carrier_frequency(signal, sampling_rate, method="welch", band=None):
+    # Windowed spectral peak with sub-bin interpolation, optionally restricted
+    # to a candidate band
+    return estimate_carrier(signal, sampling_rate, method, band)
+
+@cached_stage
+def demodulate_mary_capture(modulated_signal, scheme, carrier_freq, Ts, sampling_rate):
+    return demodulate_mary(modulated_signal, scheme, carrier_freq, Ts, sampling_rate)
+
+def show_mary_receiver(modulated_signal, scheme, carrier_freq, Ts, sampling_rate):
+    """Received constellation and bit errors of an M-ary capture."""
+    bits, llrs, symbols = demodulate_mary_capture(modulated_signal, scheme, carrier_freq, Ts, sampling_rate)
+    fig, ax = plt.subplots(figsize=(6, 6))
+    constellation_density(symbols).plot(ax)
+    ax.set_title(f"{scheme} received constellation")
+    pyplot(fig)
+
+    sent = session_artifacts().bit_sequence()
+    num_bits = min(len(sent), len(bits))
+    errors = int(np.count_nonzero(sent.to_bits()[:num_bits] != bits[:num_bits]))
+    st.write(f"{len(symbols)} symbols, {errors} bit errors out of {num_bits}, "
+             f"mean |LLR| {np.mean(np.abs(llrs)):.1f}")
+    session_artifacts().put(f"demapped_bits_{scheme}", bits, sampling_rate=sampling_rate, Ts=Ts)
+    session_artifacts().put(f"llr_{scheme}", llrs, sampling_rate=sampling_rate, Ts=Ts)
 
 def read_signal(filename):
     """Reads the modulated signal from a file."""
-    with open(filename, 'r') as file:
-        lines = file.readlines()
-        signal_data = np.array([float(line.strip()) for line in lines if not line.startswith("#")])
+    signal_data, _ = session_artifacts().signal(filename)
     return signal_data
 
-def save_signal(signal, filename):
-    """Saves the signal data to a text file."""
-    np.savetxt(filename, signal)
-
-def plot_signal(signal, title="Signal", sampling_rate=1000):
-    total_duration_ms = len(signal) * (1000 / sampling_rate)
-    t = np.linspace(0, total_duration_ms / 1000, len(signal))
-
+def plot_signal(signal, title="Signal", sampling_rate=1000, time_range=None):
     fig, ax = plt.subplots(figsize=(8, 6))
-    ax.plot(t, signal, label=title, color='green')
+    plot_decimated(ax, signal, dt=1 / sampling_rate, time_range=time_range, label=title, color='green')
     ax.set_xlabel('Time (s)')
     ax.set_ylabel('Amplitude')
     ax.set_title(title)
     ax.legend()
     ax.grid(True)
 
-    st.pyplot(fig)
-
-def getsignal_ts():
-    filename = "binary_sequence_and_period.txt"
-    try:
-        with open(filename, 'r') as file:
-            lines = file.readlines()[1:]  # Skip the first line (header)
-            binary_sequence = []
-            periods = []
-            for line in lines:
-                try:
-                    value, period = line.split()
-                    binary_sequence.append(int(value))
-                    periods.append(float(period))
-                except ValueError:
-                    st.warning(f"Skipping line with invalid format: {line.strip()}")
-    except Exception as e:
-        st.error(f"An error occurred while reading the file: {e}")
-        return [], 0
-
-    if len(set(periods)) == 1:
-        return binary_sequence, periods[0]  # Return the sequence and the consistent period
-    else:
-        st.error("The periods in the file are not consistent.")
-        return [], 0
-
-def filtre_NRZ(signal, Ts, sampling_rate=1000):
-    num_samples_per_period = int(Ts * sampling_rate / 1000)
-    nrz_signal = np.zeros(len(signal) * num_samples_per_period)
-    for i, bit in enumerate(signal):
-        value = 1 if bit == 1 else -1
-        nrz_signal[i * num_samples_per_period:(i + 1) * num_samples_per_period] = value
-    return nrz_signal
-
-def filtre_nyquist(signal, Ts, sampling_rate=1000):
-    num_samples_per_period = int(Ts * sampling_rate / 1000)
-    roll_off = 0.25
-    nyquist_filter = firwin(numtaps=101, cutoff=1.0 / num_samples_per_period, window=('kaiser', roll_off))
-    nyquist_signal = lfilter(nyquist_filter, 1.0, signal)
-    return nyquist_signal
+    pyplot(fig)
 
 def main():
     st.title("Modulation and Demodulation")
-    filename = 'modulated_signal_ASK.txt'
-    modulated_signal = read_signal(filename)
-    nnyquist = 'nyquist_signal.txt'
+    export_artifacts_sidebar(session_artifacts())
+    modulation_type = st.selectbox("Modulation Type", list(DETECTORS) + list(SCHEMES))
+    filename = f'modulated_signal_{modulation_type}.npy'
+    modulated_signal, metadata = session_artifacts().signal(filename)
+    nnyquist = 'nyquist_signal.npy'
     nnyquistdemo = read_signal(nnyquist)
 
     # User input
     sampling_rate = 1000
     Ts =20.0
+    # Symbol period of the stored signal, the default one otherwise
+    symbol_period = metadata.get("Ts", Ts)
     
     # Detect the carrier frequency from the modulated signal
-    detected_carrier_freq = detect_carrier_frequency(modulated_signal, sampling_rate)
-    st.write(f"Detected Carrier Frequency: {detected_carrier_freq} Hz")
+    carrier_method = st.selectbox("Carrier estimator", CARRIER_METHODS)
+    band = st.slider("Carrier search band (Hz)", 0.0, sampling_rate / 2, (0.0, sampling_rate / 2))
+    detected_carrier_freq = detect_carrier_frequency(modulated_signal, sampling_rate, carrier_method, band)
+    st.write(f"Detected Carrier Frequency: {detected_carrier_freq:.3f} Hz")
+
+    if modulation_type in SCHEMES:
+        # Suppressed-carrier spectra have no line at the carrier: use the nominal one
+        carrier_freq = metadata.get("carrier_freq", detected_carrier_freq)
+        show_mary_receiver(modulated_signal, modulation_type, carrier_freq, symbol_period, sampling_rate)
+        return
     
-    # Demodulate the signal using the detected carrier frequency
-    demodulated_signal = demodulate(modulated_signal, detected_carrier_freq, sampling_rate)
+    # Demodulate the signal using the detected carrier frequency (FSK spreads
+    # its power over both tones, so its nominal lower tone is used instead)
+    detector = st.selectbox("Detector", DETECTORS[modulation_type])
+    carrier_freq = detected_carrier_freq
+    if modulation_type == "FSK":
+        carrier_freq = metadata.get("carrier_freq", detected_carrier_freq)
+    demodulated_signal = demodulate_capture(modulated_signal, modulation_type, carrier_freq, sampling_rate,
+                                            detector, symbol_period)
 
     # Save the demodulated signal
-    save_signal(nnyquistdemo, 'saved_demodulated_signal.txt')
+    session_artifacts().put('saved_demodulated_signal', nnyquistdemo, sampling_rate=sampling_rate,
+                              Ts=symbol_period, carrier_freq=carrier_freq)
     
     # Plot the signals
-    t = np.arange(len(modulated_signal)) / sampling_rate
+    time_range = time_range_slider(len(modulated_signal) / sampling_rate)
 
     fig, ax = plt.subplots(2, 1, figsize=(12, 8))
   
-    ax[0].plot(t, modulated_signal, label='Modulated Signal')
+    plot_decimated(ax[0], modulated_signal, dt=1 / sampling_rate, time_range=time_range, label='Modulated Signal')
     ax[0].legend()
     ax[0].set_title("Modulated Signal")
     ax[0].set_xlabel("Time (s)")
     ax[0].set_ylabel("Amplitude")
 
-    ax[1].plot(t, nnyquistdemo, label='Demodulated Signal')
+    plot_decimated(ax[1], nnyquistdemo, dt=1 / sampling_rate, time_range=time_range, label='Demodulated Signal')
     ax[1].legend()
     ax[1].set_title("Demodulated Signal")
     ax[1].set_xlabel("Time (s)")
     ax[1].set_ylabel("Amplitude")
 
-    st.pyplot(fig)
+    pyplot(fig)
+
+    st.subheader(f"{modulation_type} receiver output ({detector})")
+    plot_signal(demodulated_signal, title="Receiver Output", sampling_rate=sampling_rate, time_range=time_range)
+
+    st.subheader("Eye diagram")
+    fig, ax = plt.subplots(figsize=(8, 5))
+    eye_diagram(demodulated_signal, samples_per_symbol(symbol_period, sampling_rate)).plot(ax)
+    pyplot(fig)
 
 if __name__ == "__main__":
-    main()
+    precision_sidebar()
+    profiled(main)
@@ -1,61 +1,56 @@
 import numpy as np
 import streamlit as st
 import matplotlib.pyplot as plt
-from scipy.signal import find_peaks
+
+from decision import TIMING_METHODS, decide
+from density import eye_diagram
+from plotting import plot_decimated
+from symbol_rate import estimate_symbol_rate
+from stage_cache import cached_stage
+from utils import export_artifacts_sidebar, precision_sidebar, profiled, pyplot, session_artifacts, time_range_slider
 
 def read_signal(filename):
     """Reads the signal from a file."""
     try:
-        signal_data = np.loadtxt(filename)
+        signal_data, _ = session_artifacts().signal(filename)
         return signal_data
     except Exception as e:
         st.error(f"Error reading the file: {e}")
         return np.array([])
 
-def detect_period(demodulated_signal, sampling_rate):
-    """Detects the period of the NRZ signal from the demodulated signal."""
-    peaks, _ = find_peaks(np.abs(demodulated_signal), height=np.max(np.abs(demodulated_signal)) * 0.5)
-    if len(peaks) > 1:
-        periods = np.diff(peaks) / sampling_rate
-        average_period = np.mean(periods)
-    else:
-        average_period = None
-    return average_period, peaks
-
-def read_binary_sequence_and_period(filename):
+@cached_stage
+def detect_period(demodulated_signal, sampling_rate, carrier_freq=None):
+    """
+    Detects the symbol period (s) of the demodulated signal from the spectral line at the
+    symbol rate, searched below the carrier residue when `carrier_freq` is known. Also returns
+    the line height above the floor (dB) and the symbol phase (samples).
+    """
+    rate, confidence, phase = estimate_symbol_rate(demodulated_signal, sampling_rate,
+                                                   carrier_freq=carrier_freq)
+    average_period = 1 / rate if rate else None
+    return average_period, confidence, phase
+
+def read_binary_sequence_and_period(filename=None):
     """Reads binary sequence and period from a file."""
     try:
-        with open(filename, 'r') as file:
-            lines = file.readlines()[1:]  # Skip the first line (header)
-            binary_sequence = []
-            periods = []
-            for line in lines:
-                try:
-                    value, period = line.split()
-                    binary_sequence.append(int(value))
-                    periods.append(float(period))
-                except ValueError:
-                    st.warning(f"Skipping line with invalid format: {line.strip()}")
+        binary_sequence = session_artifacts().bit_sequence(filename)
     except Exception as e:
         st.error(f"An error occurred while reading the file: {e}")
         return [], 0
-
-    if len(set(periods)) == 1:
-        return binary_sequence, periods[0]  # Return the sequence and the consistent period
-    else:
-        st.error("The periods in the file are not consistent.")
-        return [], 0
-
-def extract_binary_sequence(demodulated_signal, period, sampling_rate):
-    """Extracts the binary sequence from the demodulated signal based on the detected period."""
-    binary_sequence = []
-    step = int(period * sampling_rate)
-    for i in range(0, len(demodulated_signal), step):
-        segment = demodulated_signal[i:i+step]
-        if len(segment) > 0:
-            bit = 1 if np.mean(segment) > 0 else 0
-            binary_sequence.append(bit)
-    return binary_sequence
+    return binary_sequence, binary_sequence.period_ms
+
+@cached_stage
+def extract_binary_sequence(demodulated_signal, sps, offset=0, timing="none"):
+    """
+    Extracts the binary sequence from the demodulated signal, `sps` samples per symbol with the
+    first symbol starting at sample `offset`. Samples before `offset` are decided as a symbol of
+    their own when they cover at least half a slot. Returns the hard bits, their soft values and
+    the recovered sampling phase of each block.
+    """
+    if 2 * offset >= sps:
+        # Zeros keep the sign of the partial slot mean
+        return decide(np.concatenate((np.zeros(sps - offset), demodulated_signal)), sps, timing)
+    return decide(demodulated_signal[offset:], sps, timing)
 
 def nyquist_filter(binary_sequence, period, sampling_rate):
     """Generates a Nyquist filtered signal based on binary sequence."""
@@ -72,8 +67,9 @@ def nyquist_filter(binary_sequence, period, sampling_rate):
 
 def main():
     st.title("NRZ Signal Detection and Binary Sequence Extraction")
+    export_artifacts_sidebar(session_artifacts())
 
-    filename = 'saved_demodulated_signal.txt'
+    filename = 'saved_demodulated_signal.npy'
     sampling_rate = st.number_input("Sampling Rate (Hz)", min_value=100, step=100, value=1000)
 
     demodulated_signal = read_signal(filename)
@@ -83,30 +79,41 @@ def main():
         return
 
     # Plot the demodulated signal
-    t = np.arange(len(demodulated_signal)) / sampling_rate
+    time_range = time_range_slider(len(demodulated_signal) / sampling_rate)
     fig, ax = plt.subplots(figsize=(12, 6))
-    ax.plot(t, demodulated_signal, label='Demodulated Signal')
+    plot_decimated(ax, demodulated_signal, dt=1 / sampling_rate, time_range=time_range, label='Demodulated Signal')
     ax.set_title("Demodulated Signal")
     ax.set_xlabel("Time (s)")
     ax.set_ylabel("Amplitude")
     ax.legend()
-    st.pyplot(fig)
+    pyplot(fig)
     
-    binary_sequence, period = read_binary_sequence_and_period("binary_sequence_and_period.txt")
-    detected_period, peaks = detect_period(demodulated_signal, sampling_rate)
+    binary_sequence, period = read_binary_sequence_and_period()
+    # The carrier, when known, bounds the search below its residue
+    carrier_freq = session_artifacts().signal(filename)[1].get("carrier_freq")
+    detected_period, confidence, phase = detect_period(demodulated_signal, sampling_rate, carrier_freq)
 
-    if detected_period is not None:
-        st.write(f"Detected Period: {detected_period:.4f} s")
-    else:
+    if detected_period is None:
         st.write("Unable to detect the period of the signal.")
         return
+    st.write(f"Detected Period: {detected_period:.4f} s "
+             f"(line {confidence:.1f} dB above the floor, symbols start at sample {phase:.1f})")
+
+    # Decide on the detected period; the stored one is only a check
+    sps = max(round(detected_period * sampling_rate), 1)
+    if period and abs(detected_period - period / 1000) > 0.02 * period / 1000:
+        st.warning(f"The detected period differs from the stored one ({period / 1000:.4f} s)")
+    offset = int(round(phase)) % sps
+
+    # Eye diagram folded on the decision period, mid-symbol instants at 0 and 1
+    fig, ax = plt.subplots(figsize=(8, 5))
+    eye_diagram(demodulated_signal, sps, offset=offset + sps / 2).plot(ax)
+    ax.set_title("Eye Diagram")
+    pyplot(fig)
 
     # Apply Nyquist filter based on binary sequence
     nyquist_signal = nyquist_filter(binary_sequence, period, sampling_rate)
     
-    # Generate time vector for Nyquist signal
-    t_nyquist = np.arange(0, len(nyquist_signal)) / sampling_rate
-
     # Plot the NRZ signal
     nrz_signal = read_signal("nrz_signal.txt")
     t_nrz = np.arange(len(nrz_signal)) / sampling_rate
@@ -120,15 +127,35 @@ def main():
 
     # Plot the Nyquist filtered signal
     fig, ax = plt.subplots(figsize=(12, 6))
-    ax.plot(t_nyquist, nyquist_signal, label='Nyquist Filtered Signal')
+    plot_decimated(ax, nyquist_signal, dt=1 / sampling_rate, time_range=time_range, label='Nyquist Filtered Signal')
     ax.set_title("Nyquist Filtered Signal")
     ax.set_xlabel("Time (s)")
     ax.set_ylabel("Amplitude")
     ax.legend()
-    st.pyplot(fig)
+    pyplot(fig)
 
     # Display the binary sequence
     st.write(f"Binary Sequence: {binary_sequence}")
 
+    # Decide the received bits, optionally recovering the symbol timing
+    timing = st.selectbox("Symbol timing recovery", TIMING_METHODS)
+    decided, soft, offsets = extract_binary_sequence(demodulated_signal, sps, offset, timing)
+    if timing != "none":
+        st.write(f"Sampling phase: {np.mean(offsets) + offset:.2f} samples")
+    st.write(f"Decided Sequence: {''.join(map(str, decided))}")
+    if len(binary_sequence):
+        num = min(len(decided), len(binary_sequence))
+        st.write(f"Bit errors: {binary_sequence[:num].bit_errors(decided[:num])} / {num}")
+        if len(decided) != len(binary_sequence):
+            st.write(f"{len(decided)} bits decided for {len(binary_sequence)} sent")
+
+    fig, ax = plt.subplots(figsize=(12, 4))
+    ax.hist(soft, bins=100, color='purple')
+    ax.set_title("Soft Values")
+    ax.set_xlabel("Integrate-and-dump output")
+    ax.set_ylabel("Count")
+    pyplot(fig)
+
 if __name__ == "__main__":
-    main()
+    precision_sidebar()
+    profiled(main)
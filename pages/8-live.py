@@ -0,0 +1,107 @@
+import time
+
+import matplotlib.pyplot as plt
+import streamlit as st
+
+from chain import MODULATIONS
+from live import TAPS, LiveChain
+from plotting import plot_decimated
+from utils import precision_sidebar
+
+# The chain stops once the page has not redrawn it for this long (page left, tab closed)
+IDLE_TIMEOUT_S = 10.0
+
+
+def chain_settings():
+    """Sidebar parameters of the live chain."""
+    st.sidebar.markdown("## Live chain")
+    modulation_type = st.sidebar.selectbox("Modulation", MODULATIONS)
+    sampling_rate = st.sidebar.number_input("Sampling rate (Hz)", min_value=100, step=100, value=1000)
+    # The carrier, and twice the carrier for FSK, must stay below the Nyquist frequency
+    highest = (sampling_rate / 4 if modulation_type == "FSK" else sampling_rate / 2) - 1.0
+    f0 = st.sidebar.number_input("Carrier frequency (Hz)", min_value=1.0, max_value=highest,
+                                 value=min(250.0, highest))
+    return dict(
+        filter_type=st.sidebar.selectbox("Line code", ["NRZ", "RZ", "Miller", "Manchester", "HDBN"]),
+        modulation_type=modulation_type,
+        noise_level=st.sidebar.number_input("Noise level", min_value=0.0, value=0.1, step=0.05),
+        Ts=st.sidebar.number_input("Bit period (ms)", min_value=1, value=20),
+        sampling_rate=sampling_rate,
+        f0=f0,
+        block_bits=st.sidebar.number_input("Bits per block", min_value=1, value=8),
+        seconds=st.sidebar.number_input("Window (s)", min_value=1.0, value=5.0),
+    )
+
+
+def show_frame(live, stats_area, plot_area):
+    """Draws the ring buffers and the statistics once."""
+    stats = live.stats()
+    with stats_area.container():
+        columns = st.columns(4)
+        columns[0].metric("Blocks", stats["blocks"])
+        columns[1].metric("Dropped blocks", stats["dropped"])
+        columns[2].metric("Samples/s", f"{stats['samples_per_s']:.0f}", f"target {stats['target_rate']:.0f}",
+                          delta_color="off")
+        columns[3].metric("Decision delay (s)", f"{stats['decision_delay_s']:.2f}")
+        if stats["stages"]:
+            st.table([{"stage": row["stage"], "last (ms)": round(row["last_ms"], 3),
+                       "mean (ms)": round(row["mean_ms"], 3), "max (ms)": round(row["max_ms"], 3)}
+                      for row in stats["stages"]])
+
+    buffers = live.snapshot()
+    fig, axes = plt.subplots(len(TAPS), 1, figsize=(12, 2.5 * len(TAPS)), sharex=True)
+    for ax, name in zip(axes, TAPS):
+        y = buffers[name]
+        # Time of the oldest buffered sample
+        t0 = (live.buffers[name].total - len(y)) / live.sampling_rate
+        plot_decimated(ax, y, dt=1 / live.sampling_rate, t0=t0)
+        ax.set_ylabel(name.capitalize())
+    axes[-1].set_xlabel("Time (s)")
+    plot_area.pyplot(fig)
+    plt.close(fig)
+
+
+def main():
+    st.title("Live Transmission")
+    st.write("Random bits are generated, coded, modulated, sent through the noise and demodulated without "
+             "stopping. The plots show the last seconds of each stage.")
+
+    settings = chain_settings()
+    speed = st.sidebar.number_input("Speed (x real time)", min_value=0.1, value=1.0)
+    fps = st.sidebar.slider("Frames per second", 1, 30, 5)
+
+    live = st.session_state.get("live_chain")
+    start, stop = st.columns(2)
+    if start.button("Start"):
+        if live is not None:
+            live.stop()
+        try:
+            live = LiveChain(target_rate=settings["sampling_rate"] * speed, idle_timeout=IDLE_TIMEOUT_S,
+                             **settings).start()
+        except ValueError as e:
+            st.error(str(e))
+            live = None
+        st.session_state["live_chain"] = live
+    if stop.button("Stop") and live is not None:
+        live.stop()
+
+    if live is None:
+        st.info("Press Start to run the chain.")
+        return
+    if live.error is not None:
+        st.error(f"The live chain stopped: {live.error}")
+
+    stats_area = st.empty()
+    plot_area = st.empty()
+    # Any widget change reruns the script, which ends this loop
+    while True:
+        live.touch()
+        show_frame(live, stats_area, plot_area)
+        if not live.running:
+            break
+        time.sleep(1 / fps)
+
+
+if __name__ == "__main__":
+    precision_sidebar()
+    main()
@@ -0,0 +1,181 @@
+"""
+Running Welch PSD and STFT spectrogram of long signals.
+
+Both estimators take the signal block by block. Samples that do not fill a
+whole segment wait for the next block, so the segments, and the result, are
+the same whatever the block sizes. Segments are `nperseg` samples long,
+overlap by `overlap` (fraction of a segment), are detrended by their mean
+and windowed, then transformed in batches of BATCH_SEGMENTS.
+
+- `WelchEstimator` keeps only the sum of the periodograms: memory is one
+  spectrum. Its `psd` matches `scipy.signal.welch` (density scaling).
+- `Spectrogram` keeps one row per segment, up to `max_rows`. Beyond that,
+  adjacent rows are averaged pairwise and every later row averages twice as
+  many segments, so any capture length fits in `max_rows` rows.
+
+`occupied_bandwidth` reads the band holding a given fraction of the power
+from a PSD.
+"""
+import numpy as np
+
+WINDOWS = ["hann", "hamming", "blackman", "boxcar"]
+# Segments transformed per FFT call
+BATCH_SEGMENTS = 256
+
+
+class _Segmenter:
+    """Splits a stream of blocks into overlapping windowed segments and their power spectra."""
+
+    def __init__(self, sampling_rate, nperseg=1024, overlap=0.5, window="hann", onesided=True):
+        from scipy.signal import get_window
+
+        self.sampling_rate = sampling_rate
+        self.nperseg = int(nperseg)
+        self.step = max(int(round(self.nperseg * (1 - overlap))), 1)
+        self.window = get_window(window, self.nperseg)
+        self.onesided = onesided
+        self.num_samples = 0
+        self.num_segments = 0
+        self._pending = np.empty(0)
+        # Density scaling of scipy.signal.welch
+        self._scale = 1 / (sampling_rate * np.sum(self.window ** 2))
+
+    def frequencies(self):
+        if self.onesided:
+            return np.fft.rfftfreq(self.nperseg, 1 / self.sampling_rate)
+        return np.fft.fftshift(np.fft.fftfreq(self.nperseg, 1 / self.sampling_rate))
+
+    def _spectra(self, segments):
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        if self.onesided and not np.iscomplexobj(segments):
+            power = np.abs(np.fft.rfft(segments * self.window, axis=-1)) ** 2 * self._scale
+            # Fold the negative frequencies, except DC and Nyquist
+            power[..., 1:(self.nperseg + 1) // 2] *= 2
+            return power
+        power = np.abs(np.fft.fft(segments * self.window, axis=-1)) ** 2 * self._scale
+        return np.fft.fftshift(power, axes=-1)
+
+    def segment_spectra(self, block):
+        """Power spectra of the segments completed by `block`, in batches."""
+        block = np.asarray(block)
+        self.num_samples += len(block)
+        x = np.concatenate((self._pending, block)) if len(self._pending) else block
+        count = (len(x) - self.nperseg) // self.step + 1 if len(x) >= self.nperseg else 0
+        if count:
+            segments = np.lib.stride_tricks.sliding_window_view(x, self.nperseg)[::self.step][:count]
+            for start in range(0, count, BATCH_SEGMENTS):
+                yield self._spectra(segments[start:start + BATCH_SEGMENTS])
+        self.num_segments += count
+        self._pending = np.array(x[count * self.step:])
+
+
+class WelchEstimator(_Segmenter):
+    """Averaged periodogram of a signal fed with `update`."""
+
+    def __init__(self, sampling_rate, nperseg=1024, overlap=0.5, window="hann", onesided=True):
+        super().__init__(sampling_rate, nperseg, overlap, window, onesided)
+        self._sum = np.zeros(len(self.frequencies()))
+
+    def update(self, block):
+        for power in self.segment_spectra(block):
+            self._sum += power.sum(axis=0)
+        return self
+
+    def psd(self):
+        """Frequencies (Hz) and power spectral density (V**2/Hz); zeros until a segment is complete."""
+        return self.frequencies(), self._sum / max(self.num_segments, 1)
+
+
+class Spectrogram(_Segmenter):
+    """
+    STFT power of a signal fed with `update`, one row per segment, or per
+    group of segments once `max_rows` is reached.
+    """
+
+    def __init__(self, sampling_rate, nperseg=256, overlap=0.5, window="hann", onesided=True, max_rows=512):
+        super().__init__(sampling_rate, nperseg, overlap, window, onesided)
+        self.max_rows = max(max_rows // 2 * 2, 2)
+        self.segments_per_row = 1
+        self._rows = np.zeros((self.max_rows, len(self.frequencies())))
+        self._num_rows = 0
+        # Sum and count of the row being filled
+        self._partial = np.zeros(len(self.frequencies()))
+        self._partial_count = 0
+
+    def _halve(self):
+        """Averages adjacent rows pairwise, freeing half of the rows."""
+        half = self._num_rows // 2
+        self._rows[:half] = 0.5 * (self._rows[0:2 * half:2] + self._rows[1:2 * half:2])
+        self._num_rows = half
+        self.segments_per_row *= 2
+
+    def _add(self, power):
+        while len(power):
+            need = self.segments_per_row - self._partial_count
+            if self._partial_count or len(power) < need:
+                take = min(need, len(power))
+                self._partial += power[:take].sum(axis=0)
+                self._partial_count += take
+                power = power[take:]
+                if self._partial_count < self.segments_per_row:
+                    continue
+                if self._num_rows == self.max_rows:
+                    # The complete row becomes the first half of a row twice as long
+                    self._halve()
+                    continue
+                self._rows[self._num_rows] = self._partial / self._partial_count
+                self._num_rows += 1
+                self._partial = np.zeros_like(self._partial)
+                self._partial_count = 0
+                continue
+            # Whole rows at once, as many as there is room for
+            count = min(len(power) // need, self.max_rows - self._num_rows)
+            if not count:
+                self._halve()
+                continue
+            rows = power[:count * need].reshape(count, need, -1).mean(axis=1)
+            self._rows[self._num_rows:self._num_rows + count] = rows
+            self._num_rows += count
+            power = power[count * need:]
+
+    def update(self, block):
+        for power in self.segment_spectra(block):
+            self._add(power)
+        return self
+
+    def image(self):
+        """Times (s, centre of each row), frequencies (Hz) and power (rows x frequencies)."""
+        span = self.segments_per_row * self.step
+        times = (np.arange(self._num_rows) * span + (span - self.step + self.nperseg) / 2) / self.sampling_rate
+        return times, self.frequencies(), self._rows[:self._num_rows]
+
+
+def welch_psd(x, sampling_rate, nperseg=1024, overlap=0.5, window="hann", onesided=True, block_size=1 << 20):
+    """Welch PSD of a whole signal, read `block_size` samples at a time."""
+    estimator = WelchEstimator(sampling_rate, min(nperseg, max(len(x), 1)), overlap, window, onesided)
+    for start in range(0, len(x), block_size):
+        estimator.update(x[start:start + block_size])
+    return estimator.psd()
+
+
+def spectrogram(x, sampling_rate, nperseg=256, overlap=0.5, window="hann", max_rows=512, block_size=1 << 20):
+    """Spectrogram of a whole signal, read `block_size` samples at a time."""
+    estimator = Spectrogram(sampling_rate, min(nperseg, max(len(x), 1)), overlap, window, max_rows=max_rows)
+    for start in range(0, len(x), block_size):
+        estimator.update(x[start:start + block_size])
+    return estimator.image()
+
+
+def occupied_bandwidth(freqs, psd, fraction=0.99):
+    """
+    Width (Hz) of the band holding `fraction` of the power of a PSD, with
+    (1 - fraction) / 2 of the power left out on each side.
+    """
+    cumulative = np.cumsum(psd)
+    if not len(cumulative) or cumulative[-1] <= 0:
+        return 0.0
+    cumulative = cumulative / cumulative[-1]
+    tail = (1 - fraction) / 2
+    lo = np.searchsorted(cumulative, tail)
+    hi = min(np.searchsorted(cumulative, 1 - tail), len(freqs) - 1)
+    return float(freqs[hi] - freqs[lo])
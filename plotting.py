@@ -0,0 +1,64 @@
+"""
+Shape-preserving decimation for plotting long signals.
+
+A line plot cannot show more than one value per horizontal pixel, so each
+pixel-wide bucket of samples is reduced to its minimum and maximum, kept in
+time order. Peaks and bit transitions survive and the number of points handed
+to matplotlib depends on the axes width only, not on the signal length.
+"""
+import numpy as np
+
+DEFAULT_WIDTH_PX = 1200
+
+
+def minmax_indices(y, num_buckets):
+    """Indices of the min and max sample of every bucket, in increasing order."""
+    y = np.asarray(y)
+    n = len(y)
+    if n <= 2 * num_buckets:
+        return np.arange(n)
+    bucket = -(-n // num_buckets)
+    full = n // bucket * bucket
+    blocks = y[:full].reshape(-1, bucket)
+    offsets = np.arange(0, full, bucket)
+    lo = offsets + np.argmin(blocks, axis=1)
+    hi = offsets + np.argmax(blocks, axis=1)
+    pairs = np.column_stack((np.minimum(lo, hi), np.maximum(lo, hi))).ravel()
+    if full < n:
+        rest = y[full:]
+        pairs = np.concatenate((pairs, np.sort(full + np.array([np.argmin(rest), np.argmax(rest)]))))
+    # Keep both ends so the plotted time span does not shrink
+    return np.unique(np.concatenate(([0], pairs, [n - 1])))
+
+
+def decimate(y, width_px=DEFAULT_WIDTH_PX, t=None, dt=1.0, t0=0.0, time_range=None):
+    """
+    Returns (t, y) reduced to about two points per pixel over `time_range`.
+    The time axis is either the array `t` or the uniform grid t0 + i * dt.
+    """
+    n = len(y)
+    if time_range is None:
+        start, stop = 0, n
+    elif t is not None:
+        start, stop = np.searchsorted(t, time_range[0]), np.searchsorted(t, time_range[1], side="right")
+    else:
+        start = int(np.clip(np.floor((time_range[0] - t0) / dt), 0, n))
+        stop = int(np.clip(np.ceil((time_range[1] - t0) / dt) + 1, start, n))
+    segment = np.asarray(y[start:stop])
+    idx = minmax_indices(segment, max(int(width_px), 1))
+    t_out = np.asarray(t[start:stop])[idx] if t is not None else t0 + (start + idx) * dt
+    return t_out, segment[idx]
+
+
+def axes_width_px(ax):
+    """Width of the axes on screen in pixels."""
+    return int(np.ceil(ax.get_window_extent().width))
+
+
+def plot_decimated(ax, y, t=None, dt=1.0, t0=0.0, time_range=None, **kwargs):
+    """Draws `y` on `ax` decimated to the axes width; extra kwargs go to `ax.plot`."""
+    t_out, y_out = decimate(y, axes_width_px(ax), t=t, dt=dt, t0=t0, time_range=time_range)
+    lines = ax.plot(t_out, y_out, **kwargs)
+    if time_range is not None:
+        ax.set_xlim(*time_range)
+    return lines
@@ -0,0 +1,101 @@
+"""
+Pipeline-wide dtype policy.
+
+- "float64": every stage computes and stores float64 (the default, and the
+  historical behaviour, bit for bit);
+- "float32": stages compute and store float32, halving memory and bandwidth;
+- "int16": fixed-point emulation. Stages compute in float32 and every stage
+  output is rounded to the int16 grid of step 2**-frac_bits, saturating at
+  the int16 range, as a 16-bit datapath would. Signals are saved as the
+  int16 codes with the step in their sidecar.
+
+Phases (carriers, FSK phase accumulation, time axes) are still accumulated
+in float64 so long captures do not drift; only their cos/sin results take
+the policy dtype. The policy is per thread, like the profiling flag, so
+each Streamlit session keeps its own.
+"""
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+PRECISIONS = ["float64", "float32", "int16"]
+
+_local = threading.local()
+
+
+class Precision:
+    """A dtype policy: `name` in PRECISIONS and, for int16, the fractional bits."""
+
+    def __init__(self, name="float64", frac_bits=12):
+        if name not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {name}")
+        self.name = name
+        self.frac_bits = int(frac_bits)
+        self.dtype = np.dtype(np.float64 if name == "float64" else np.float32)
+        self.complex_dtype = np.result_type(self.dtype, np.complex64)
+        self.storage_dtype = np.dtype(np.int16) if name == "int16" else self.dtype
+        self.step = 2.0 ** -self.frac_bits
+
+    def __repr__(self):
+        extra = f", frac_bits={self.frac_bits}" if self.name == "int16" else ""
+        return f"Precision({self.name!r}{extra})"
+
+    def asarray(self, x):
+        """`x` in the compute dtype (complex stays complex), without copying when it already is."""
+        x = np.asarray(x)
+        return x.astype(self.complex_dtype if np.iscomplexobj(x) else self.dtype, copy=False)
+
+    def quantize(self, x):
+        """int16 codes of `x` on the fixed-point grid, saturating."""
+        info = np.iinfo(np.int16)
+        return np.clip(np.round(np.asarray(x) / self.step), info.min, info.max).astype(np.int16)
+
+    def dequantize(self, codes):
+        return np.asarray(codes).astype(self.dtype) * self.dtype.type(self.step)
+
+    def cast(self, x):
+        """
+        A stage output in the policy: converted to the compute dtype, and
+        rounded to the fixed-point grid for int16 (I and Q separately).
+        """
+        x = self.asarray(x)
+        if self.name != "int16":
+            return x
+        if np.iscomplexobj(x):
+            return (self.dequantize(self.quantize(x.real)) + 1j * self.dequantize(self.quantize(x.imag))).astype(
+                self.complex_dtype)
+        return self.dequantize(self.quantize(x))
+
+    def to_storage(self, x):
+        """Array to write to disk: int16 codes, or the compute dtype."""
+        x = np.asarray(x)
+        if self.name == "int16" and np.issubdtype(x.dtype, np.floating):
+            return self.quantize(x)
+        if np.issubdtype(x.dtype, np.floating) or np.iscomplexobj(x):
+            return self.asarray(x)
+        return x
+
+
+def current():
+    """The policy of this thread (float64 until `set_precision` is called)."""
+    policy = getattr(_local, "policy", None)
+    if policy is None:
+        policy = _local.policy = Precision()
+    return policy
+
+
+def set_precision(name="float64", frac_bits=12):
+    _local.policy = name if isinstance(name, Precision) else Precision(name, frac_bits)
+    return _local.policy
+
+
+@contextmanager
+def use_precision(name, frac_bits=12):
+    """Runs the enclosed block under another policy."""
+    previous = current()
+    set_precision(name, frac_bits)
+    try:
+        yield current()
+    finally:
+        _local.policy = previous
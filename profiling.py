@@ -0,0 +1,185 @@
+"""
+Lightweight per-stage instrumentation.
+
+`instrument` wraps a function and `stage` a block of code. While profiling is
+enabled they record, for every call, the wall and CPU time, the peak memory
+allocated during the call (tracemalloc, which follows NumPy buffers) and the
+sizes of the arrays going in and out. Calls nested in an instrumented call
+are recorded too, with their depth, so a slow stage can be split into filter
+design, filtering, FFT and rendering.
+
+When profiling is disabled the hooks only test a flag before calling
+through. The flag and the records are per thread, and Streamlit runs each
+session in its own thread, so concurrent sessions do not see each other's
+records. CPU time is the thread's own. tracemalloc is process-wide, so
+only one recording thread at a time measures memory: a session that enables
+profiling while another one is recording gets its times without the memory
+figures (alloc_bytes None) instead of waiting. Memory figures still include
+what unprofiled threads allocate meanwhile, and are exact only when one
+session is running.
+"""
+import csv
+import functools
+import io
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+FIELDS = ["name", "depth", "wall_s", "cpu_s", "alloc_bytes", "in_items", "out_items"]
+
+_local = threading.local()
+# Held by the thread measuring memory, from `enable` to `disable`
+_recording = threading.Lock()
+
+
+def enabled():
+    return getattr(_local, "enabled", False)
+
+
+def tracing():
+    """Whether this thread's records have memory figures."""
+    return getattr(_local, "tracing", False)
+
+
+def enable():
+    """
+    Starts recording in this thread, with an empty record list. Returns
+    whether memory is measured too, which it is unless another thread is
+    already measuring it.
+    """
+    _local.records = []
+    _local.frames = []
+    if enabled():
+        return tracing()
+    _local.enabled = True
+    _local.tracing = _recording.acquire(blocking=False)
+    _local.started_tracing = _local.tracing and not tracemalloc.is_tracing()
+    if _local.started_tracing:
+        tracemalloc.start()
+    return _local.tracing
+
+
+def disable():
+    """Stops recording in this thread, and tracemalloc if it was started for it."""
+    if not enabled():
+        return
+    _local.enabled = False
+    if _local.started_tracing:
+        tracemalloc.stop()
+    if _local.tracing:
+        _local.tracing = False
+        _recording.release()
+
+
+def records():
+    """Records of this thread since `enable`, in call order."""
+    return list(getattr(_local, "records", []))
+
+
+def _items(value):
+    """Number of array elements in a value (arrays, sequences of arrays, dicts)."""
+    if isinstance(value, np.ndarray):
+        return value.size
+    if isinstance(value, (tuple, list)):
+        return sum(_items(item) for item in value if isinstance(item, (np.ndarray, tuple, list, dict)))
+    if isinstance(value, dict):
+        return sum(_items(item) for item in value.values())
+    return getattr(value, "num_bits", 0)
+
+
+class _Frame:
+    def __init__(self, name, inputs):
+        self.record = {"name": name, "depth": len(_local.frames), "in_items": _items(inputs), "out_items": 0}
+        _local.records.append(self.record)
+        self.tracing = tracing()
+        self.start_memory = self.peak = 0
+        if self.tracing:
+            parent = _local.frames[-1] if _local.frames else None
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                # The parent's peak so far would be lost by the reset below
+                parent.peak = max(parent.peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+            self.peak = current
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.thread_time()
+        _local.frames.append(self)
+
+    def close(self, output=None):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.thread_time() - self.start_cpu
+        _local.frames.pop()
+        alloc = None
+        if self.tracing:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if _local.frames:
+                _local.frames[-1].peak = max(_local.frames[-1].peak, self.peak)
+            alloc = self.peak - self.start_memory
+        self.record.update(wall_s=wall, cpu_s=cpu, alloc_bytes=alloc, out_items=_items(output))
+
+
+@contextmanager
+def stage(name, inputs=None):
+    """Records the enclosed block as one stage when profiling is enabled."""
+    if not enabled():
+        yield
+        return
+    frame = _Frame(name, inputs)
+    try:
+        yield
+    finally:
+        frame.close()
+
+
+def instrument(func=None, name=None):
+    """Decorator recording every call of `func` (under `name`, by default its qualified name)."""
+    if func is None:
+        return functools.partial(instrument, name=name)
+    label = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not getattr(_local, "enabled", False):
+            return func(*args, **kwargs)
+        frame = _Frame(label, (args, kwargs))
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            frame.close(result)
+    return wrapper
+
+
+def to_json(rows=None):
+    return json.dumps(records() if rows is None else rows, indent=1)
+
+
+def to_csv(rows=None):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(records() if rows is None else rows)
+    return buffer.getvalue()
+
+
+def summary(rows=None):
+    """
+    Total wall time, CPU time and largest allocation (None without memory
+    figures) per stage name, slowest first.
+    """
+    totals = {}
+    for r in records() if rows is None else rows:
+        total = totals.setdefault(r["name"], {"name": r["name"], "calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                              "alloc_bytes": None})
+        total["calls"] += 1
+        total["wall_s"] += r.get("wall_s", 0.0)
+        total["cpu_s"] += r.get("cpu_s", 0.0)
+        if r.get("alloc_bytes") is not None:
+            total["alloc_bytes"] = max(total["alloc_bytes"] or 0, r["alloc_bytes"])
+    return sorted(totals.values(), key=lambda t: -t["wall_s"])
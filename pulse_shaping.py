@@ -0,0 +1,124 @@
+"""
+Pulse shaping from symbols by polyphase interpolation.
+
+`shape_symbols` hands the symbols and the pulse to `scipy.signal.upfirdn`,
+which upsamples and filters in one polyphase pass: each output sample costs
+len(taps) / sps multiplications instead of len(taps) for a direct-form filter
+running on the zero-stuffed signal. `matched_filter` does the reverse, filtering
+and keeping one sample per symbol in the same pass.
+"""
+import numpy as np
+
+from filtering import DIRECT_MAX_TAPS, fir_filter
+from precision import current
+from profiling import instrument
+
+PULSE_SHAPES = ["Half-sine", "Raised cosine", "Root raised cosine"]
+
+
+def _symbol_times(span, sps):
+    """Tap instants in symbol periods, centred on 0."""
+    num_taps = int(span * sps) + 1
+    return (np.arange(num_taps) - (num_taps - 1) / 2) / sps
+
+
+def rc_taps(roll_off, span, sps):
+    """Raised-cosine pulse over `span` symbols, equal to 1 at t = 0 and 0 at the other symbol instants."""
+    t = _symbol_times(span, sps)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = np.sinc(t) * np.cos(np.pi * roll_off * t) / (1 - (2 * roll_off * t) ** 2)
+    if roll_off > 0:
+        singular = np.isclose(np.abs(t), 1 / (2 * roll_off))
+        h[singular] = np.pi / 4 * np.sinc(1 / (2 * roll_off))
+    return h
+
+
+def rrc_taps(roll_off, span, sps):
+    """Root-raised-cosine pulse over `span` symbols, with unit energy."""
+    t = _symbol_times(span, sps)
+    b = roll_off
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = (np.sin(np.pi * t * (1 - b)) + 4 * b * t * np.cos(np.pi * t * (1 + b))) / \
+            (np.pi * t * (1 - (4 * b * t) ** 2))
+    h[np.isclose(t, 0)] = 1 - b + 4 * b / np.pi
+    if b > 0:
+        singular = np.isclose(np.abs(t), 1 / (4 * b))
+        h[singular] = b / np.sqrt(2) * ((1 + 2 / np.pi) * np.sin(np.pi / (4 * b)) +
+                                        (1 - 2 / np.pi) * np.cos(np.pi / (4 * b)))
+    return h / np.sqrt(np.sum(h ** 2))
+
+
+def half_sine_taps(sps):
+    """Half period of a sine filling one symbol slot (page 3's historical pulse)."""
+    return np.sin(np.pi * np.linspace(0, 1, sps))
+
+
+def pulse_taps(shape, sps, roll_off=0.25, span=8):
+    """Taps and group delay (in samples) of one of the PULSE_SHAPES."""
+    if shape == "Half-sine":
+        return half_sine_taps(sps), 0
+    elif shape == "Raised cosine":
+        taps = rc_taps(roll_off, span, sps)
+    elif shape == "Root raised cosine":
+        taps = rrc_taps(roll_off, span, sps)
+    else:
+        raise ValueError(f"Unknown pulse shape: {shape}")
+    return taps, (len(taps) - 1) // 2
+
+
+@instrument
+def shape_symbols(symbols, taps, sps, delay=0):
+    """
+    Upsamples `symbols` by `sps` and filters them with `taps` in one polyphase
+    pass. Returns len(symbols) * sps samples starting `delay` samples into the
+    full convolution, so a centred pulse lines up with its symbol slot.
+    """
+    from scipy.signal import upfirdn
+
+    policy = current()
+    symbols = np.asarray(symbols, dtype=policy.dtype)
+    if len(taps) / sps > DIRECT_MAX_TAPS:
+        # Long pulses: FFT block convolution of the zero-stuffed symbols
+        stuffed = np.zeros(len(symbols) * sps + len(taps) - 1, dtype=policy.dtype)
+        stuffed[:len(symbols) * sps:sps] = symbols
+        shaped = fir_filter(taps, stuffed)
+    else:
+        shaped = upfirdn(np.asarray(taps, dtype=policy.dtype), symbols, up=sps)
+    out = np.zeros(len(symbols) * sps, dtype=policy.dtype)
+    segment = shaped[delay:delay + len(out)]
+    out[:len(segment)] = segment
+    return policy.cast(out)
+
+
+@instrument
+def matched_filter(signal, taps, sps, delay=None, num_symbols=None):
+    """
+    Filters `signal` with the time-reversed pulse and keeps one sample per
+    symbol, taken `delay` samples into the full convolution. The default is
+    the group delay of this filter, which lines up with `shape_symbols` output.
+    """
+    from scipy.signal import upfirdn
+
+    taps = np.asarray(taps)[::-1]
+    if delay is None:
+        delay = (len(taps) - 1) // 2
+    q, r = divmod(delay, sps)
+    policy = current()
+    signal = np.asarray(signal, dtype=policy.dtype)
+    if r:
+        signal = np.concatenate((np.zeros(sps - r, dtype=policy.dtype), signal))
+        q += 1
+    decided = policy.cast(upfirdn(taps.astype(policy.dtype), signal, down=sps)[q:])
+    return decided if num_symbols is None else decided[:num_symbols]
+
+
+def bipolar(bits):
+    """Maps bit 1 to +1, bit 0 to -1 (anything else to 0)."""
+    bits = np.asarray(bits).ravel()
+    return (bits == 1).astype(np.float64) - (bits == 0)
+
+
+def pulse_shape(bits, sps, shape="Raised cosine", roll_off=0.25, span=8):
+    """Shapes a bit sequence with one of the PULSE_SHAPES, len(bits) * sps samples."""
+    taps, delay = pulse_taps(shape, sps, roll_off, span)
+    return shape_symbols(bipolar(bits), taps, sps, delay)
@@ -0,0 +1,120 @@
+import json
+import os
+
+import numpy as np
+
+from precision import current
+from profiling import instrument
+
+# Metadata keys written by the pages; any other keyword is stored as well
+METADATA_KEYS = ["sampling_rate", "Ts", "carrier_freq", "modulation"]
+
+
+def _paths(filename):
+    """Returns the (.npy, .json, .txt) paths sharing the stem of `filename`."""
+    stem, _ = os.path.splitext(filename)
+    return stem + ".npy", stem + ".json", stem + ".txt"
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def save_signal(signal, filename, **metadata):
+    """
+    Saves the signal as a raw .npy array next to a .json sidecar holding its
+    metadata (sampling_rate, Ts in ms, carrier_freq, modulation, ...). The
+    array is stored in the dtype of the precision policy: under int16, as
+    fixed-point codes with their step in the sidecar.
+    """
+    npy_path, json_path, _ = _paths(filename)
+    policy = current()
+    signal = np.asarray(signal)
+    quantized = policy.name == "int16" and np.issubdtype(signal.dtype, np.floating)
+    signal = policy.to_storage(signal)
+
+    # Write next to the target then rename, so that arrays still memory-mapped
+    # from the previous file keep their own copy instead of seeing it truncated
+    with open(npy_path + ".tmp", "wb") as file:
+        np.save(file, signal)
+    os.replace(npy_path + ".tmp", npy_path)
+
+    header = {key: _to_json(value) for key, value in metadata.items() if value is not None}
+    header["length"] = int(signal.shape[0]) if signal.ndim else 1
+    header["dtype"] = signal.dtype.str
+    if quantized:
+        header["fixed_point_step"] = policy.step
+    with open(json_path + ".tmp", "w") as file:
+        json.dump(header, file, indent=2)
+    os.replace(json_path + ".tmp", json_path)
+    return npy_path
+
+
+def read_metadata(filename):
+    """Reads the .json sidecar of a signal; empty when there is none."""
+    _, json_path, _ = _paths(filename)
+    if not os.path.exists(json_path):
+        return {}
+    with open(json_path, "r") as file:
+        return json.load(file)
+
+
+def signal_files(filename):
+    """Returns the files `load_signal` reads for `filename`."""
+    npy_path, json_path, _ = _paths(filename)
+    if os.path.exists(npy_path):
+        return [npy_path, json_path]
+    return [filename] if not filename.endswith(".npy") else [_paths(filename)[2]]
+
+
+@instrument
+def load_signal(filename, mmap_mode="r"):
+    """
+    Loads a signal and its metadata. The .npy file is memory-mapped without a
+    copy when it exists, otherwise the legacy text file is parsed. Fixed-point
+    codes are converted back to float32 values.
+    """
+    npy_path, _, txt_path = _paths(filename)
+    if os.path.exists(npy_path):
+        signal, metadata = np.load(npy_path, mmap_mode=mmap_mode), read_metadata(npy_path)
+        if "fixed_point_step" in metadata:
+            signal = signal.astype(np.float32) * np.float32(metadata["fixed_point_step"])
+        return signal, metadata
+    if not filename.endswith(".npy"):
+        txt_path = filename
+    return read_text_signal(txt_path), {}
+
+
+@instrument
+def read_text_signal(filename):
+    """Parses a legacy one-value-per-line text signal ('#' lines are comments)."""
+    return np.loadtxt(filename, comments="#", ndmin=1)
+
+
+def import_text_signal(filename, **metadata):
+    """Converts a legacy text signal to the binary format, returns the .npy path."""
+    return save_signal(read_text_signal(filename), filename, **metadata)
+
+
+def export_text_signal(filename, txt_filename=None, header=""):
+    """Writes a binary signal back to the legacy text format."""
+    signal, metadata = load_signal(filename)
+    if txt_filename is None:
+        txt_filename = _paths(filename)[2]
+    if not header and metadata.get("modulation"):
+        header = f"{metadata['modulation']} Modulated Signal"
+    np.savetxt(txt_filename, signal, fmt='%f', header=header)
+    return txt_filename
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert legacy text signals to .npy + .json")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--sampling-rate", type=float, default=1000)
+    args = parser.parse_args()
+    for name in args.files:
+        print(import_text_signal(name, sampling_rate=args.sampling_rate))
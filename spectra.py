@@ -0,0 +1,77 @@
+"""
+Theoretical power spectral densities (DSP) of the line codes of page 2,
+evaluated on whole frequency grids. Every formula takes `Ts` in ms and
+accepts scalars or arrays of frequencies in Hz.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+
+def _sinc2(f, Ts, divisor=1):
+    return np.sinc(np.pi * f * Ts * 0.001 / divisor) ** 2
+
+
+def DSP_NRZ(amp, Ts, f):
+    return amp**2 * Ts * 0.001 * _sinc2(f, Ts)
+
+
+def DSP_RZ(amp, Ts, f):
+    return amp**2 * Ts * 0.001 / 4 * _sinc2(f, Ts, 2)
+
+
+def DSP_Miller(amp, Ts, f):
+    f = np.asarray(f, dtype=np.float64)
+    x = np.pi * f * Ts * 0.001
+
+    # cos(k x) for k = 0..8 from a single cosine (Chebyshev recurrence)
+    cos = [np.ones_like(x), np.cos(x)]
+    for _ in range(7):
+        cos.append(2 * cos[1] * cos[-1] - cos[-2])
+
+    numerator = (23 - 2 * cos[1] - 22 * cos[2] - 12 * cos[3] + 5 * cos[4] + 12 * cos[5]
+                 + 2 * cos[6] - 8 * cos[7] + 2 * cos[8])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return amp**2 * Ts * 10000 / 4 / (2 * (np.pi * f * Ts)**2 * (17 + 8 * cos[2])) * numerator
+
+
+def DSP_Manchester(amp, Ts, f):
+    half = np.pi * f * Ts * 0.001 / 2
+    return np.abs(amp**2 * Ts * 0.66 * 0.01 * np.sinc(half)**2 * np.sin(half)**2)
+
+
+def DSP_HDBN(amp, Ts, f, order=3):
+    return np.abs(2 / 3 * amp**2 * Ts * 0.01 * _sinc2(f, Ts))
+
+
+def line_code_psd(filter_type, amp, Ts, f, order=3):
+    """Evaluates the DSP of a line code on any frequency array."""
+    if filter_type == "RZ":
+        return DSP_RZ(amp, Ts, f)
+    elif filter_type == "NRZ":
+        return DSP_NRZ(amp, Ts, f)
+    elif filter_type == "Miller":
+        return DSP_Miller(amp, Ts, f)
+    elif filter_type == "Manchester":
+        return DSP_Manchester(amp, Ts, f)
+    elif filter_type == "HDBN":
+        return DSP_HDBN(amp, Ts, f, order)
+    raise ValueError(f"Unknown line code: {filter_type}")
+
+
+@lru_cache(maxsize=64)
+def _psd_grid(filter_type, amp, Ts, f_min, f_max, num_points, order):
+    freqs = np.linspace(f_min, f_max, num_points)
+    psd = np.asarray(line_code_psd(filter_type, amp, Ts, freqs, order), dtype=np.float64)
+    freqs.flags.writeable = False
+    psd.flags.writeable = False
+    return freqs, psd
+
+
+def psd_grid(filter_type, amp, Ts, f_min=-20.0, f_max=20.0, num_points=1000, order=3):
+    """
+    Returns (freqs, psd) on a linspace grid, memoized on the code, amplitude,
+    Ts and grid. The arrays are shared between calls and read-only.
+    """
+    return _psd_grid(filter_type, float(amp), float(Ts), float(f_min), float(f_max),
+                     int(num_points), int(order))
@@ -0,0 +1,211 @@
+"""
+Content-addressed cache for the file loaders and the heavy stage functions.
+
+Streamlit re-executes a page script on every widget change, but imported
+modules stay loaded, so a module-level cache survives the reruns. Entries are
+keyed on the content hash of the files a loader reads, or of the arrays a
+stage receives, plus the other parameters and the precision policy of the
+calling thread (each session has its own). Results are returned read-only and
+their hash is remembered, so a downstream stage fed with a cached result does
+not hash it again and only the stage whose inputs changed recomputes.
+"""
+import functools
+import hashlib
+import os
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+import bit_sequence
+import signal_io
+from precision import current
+from profiling import stage
+
+MAX_ENTRIES = 128
+MAX_BYTES = 512 * 2**20
+
+_CHUNK = 1 << 20
+
+# (path, inode, size, mtime_ns) -> content hash
+_file_digests = {}
+# id(array) -> (weakref to array, content hash)
+_array_digests = {}
+
+
+def file_digest(path):
+    """Hash of a file's content, recomputed only when its stat changes."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    digest = _file_digests.get(key)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _file_digests[key] = digest
+    return digest
+
+
+def _remember(array, digest):
+    def forget(_, key=id(array)):
+        _array_digests.pop(key, None)
+    _array_digests[id(array)] = (weakref.ref(array, forget), digest)
+
+
+def array_digest(array):
+    """Hash of an array's dtype, shape and content."""
+    known = _array_digests.get(id(array))
+    if known is not None and known[0]() is array:
+        return known[1]
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{array.dtype.str}{array.shape}".encode())
+    h.update(np.ascontiguousarray(array).view(np.uint8).ravel())
+    digest = h.hexdigest()
+    if not array.flags.writeable:
+        _remember(array, digest)
+    return digest
+
+
+def digest(value):
+    """Hashable key for a stage argument."""
+    if isinstance(value, np.ndarray):
+        return ("array", array_digest(value))
+    if isinstance(value, bit_sequence.BitSequence):
+        return ("bits", array_digest(value.packed), value.num_bits, value.period_ms)
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(digest(item) for item in value)
+    if isinstance(value, dict):
+        return ("dict",) + tuple((key, digest(item)) for key, item in sorted(value.items()))
+    return repr(value)
+
+
+def _freeze(value, key):
+    """Makes array results read-only and registers their hash."""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+        _remember(value, hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest())
+    elif isinstance(value, bit_sequence.BitSequence):
+        _freeze(value.packed, (key, "packed"))
+    elif isinstance(value, tuple):
+        for i, item in enumerate(value):
+            _freeze(item, (key, i))
+    return value
+
+
+def _nbytes(value):
+    if isinstance(value, np.memmap):
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, bit_sequence.BitSequence):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+
+class StageCache:
+    """LRU mapping bounded both in number of entries and in array bytes."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def info(self):
+        return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+_cache = StageCache()
+
+
+def cache_info():
+    return _cache.info()
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def _function_id(func):
+    # Page functions are redefined on every rerun, so identify them by source location
+    code = getattr(func, "__code__", None)
+    return (code.co_filename if code else func.__module__, func.__qualname__)
+
+
+def _policy():
+    policy = current()
+    return policy.name, policy.frac_bits
+
+
+def _cached_call(key, func, args, kwargs):
+    entry = _cache.get(key)
+    if entry is not None:
+        return entry[0]
+    result = _freeze(func(*args, **kwargs), key)
+    _cache.put(key, result)
+    return result
+
+
+def cached_loader(files):
+    """
+    Caches a loader on the content of the files it reads; `files(filename)`
+    returns the paths the loader would open for that filename.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(filename=None, *args, **kwargs):
+            paths = [path for path in files(filename) if os.path.exists(path)]
+            if not paths:
+                return func(filename, *args, **kwargs)
+            with stage(f"{func.__qualname__} (cached)"):
+                key = (_function_id(func), tuple((path, file_digest(path)) for path in paths),
+                       digest(args), digest(kwargs), _policy())
+                return _cached_call(key, func, (filename,) + args, kwargs)
+        return wrapper
+    return decorator
+
+
+def cached_stage(func):
+    """Caches a stage function on the content of its arguments."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stage(f"{func.__qualname__} (cached)", args):
+            key = (_function_id(func), digest(args), digest(kwargs), _policy())
+            return _cached_call(key, func, args, kwargs)
+    return wrapper
+
+
+load_signal = cached_loader(signal_io.signal_files)(signal_io.load_signal)
+load_bit_sequence = cached_loader(lambda filename: [bit_sequence.bit_sequence_file(filename)])(
+    bit_sequence.load_bit_sequence)
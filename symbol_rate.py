@@ -0,0 +1,196 @@
+"""
+Blind symbol-rate estimation from spectral lines of the demodulated signal.
+
+Two memoryless nonlinearities give a line at the symbol rate whatever the
+bit pattern (runs of identical bits only weaken it):
+- the squared sample-to-sample difference turns every sharp transition into
+  a pulse (NRZ-like signals, whose square is constant);
+- the squared signal itself dips at every transition of a band-limited pulse
+  (raised-cosine-like signals, whose difference is small and noisy).
+
+Their power spectra are averaged over Hann-windowed frames of `nfft`
+samples fed block by block, so arbitrarily long signals are processed in
+bounded memory. A band-limited pulse leaves only a weak line on a strong
+smooth continuum, so the lines are searched on each spectrum divided by its
+running median. The symbol rate is the line that, with its harmonics
+weighted by 1/h, holds the most line height over both spectra: a harmonic
+misses the lines below it, and a sub-harmonic has no line of its own and
+gets the lines of the rate at reduced weight. Demodulators leave a residue
+of the carrier and its mixing products with the symbols, so the search
+stays below half the carrier, and its harmonics below the carrier, when
+the carrier is known. The line is refined by parabolic interpolation, and
+its phase gives the sample index of the symbol boundaries.
+"""
+import numpy as np
+
+from profiling import instrument
+
+# Width (in bins) of the running median taken as the floor under the line
+FLOOR_BINS = 33
+# Height (dB above the floor) from which a bin counts as a line
+LINE_DB = 6.0
+# Harmonics of a candidate rate whose lines add to its score
+HARMONICS = 8
+NONLINEARITIES = ["transitions", "envelope"]
+
+
+def _nonlinearities(x, previous):
+    """
+    Squared difference and squared signal of `x`, rows aligned on the samples
+    x[1:] (on all of `x` when the `previous` sample is given).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if previous is not None:
+        x = np.concatenate(([previous], x))
+    return np.stack((np.diff(x) ** 2, x[1:] ** 2))
+
+
+class SymbolRateEstimator:
+    """
+    Accumulates the spectra of the NONLINEARITIES over blocks of a
+    demodulated signal. `rate_range` (symbols/s) bounds the search, by default
+    from 8 frequency bins up to a quarter of the sampling rate, or half the
+    `carrier_freq` when it is lower.
+    """
+
+    def __init__(self, sampling_rate, nfft=8192, rate_range=None, carrier_freq=None):
+        self.sampling_rate = sampling_rate
+        self.nfft = nfft
+        self.rate_range = rate_range
+        self.carrier_freq = carrier_freq
+        self.power = np.zeros((len(NONLINEARITIES), nfft // 2 + 1))
+        self.num_frames = 0
+        self.num_samples = 0
+        self._previous = None
+        self._pending = np.empty((len(NONLINEARITIES), 0))
+        self._pending_start = 1
+        self._first_frame = None
+        self._first_start = 0
+
+    def _add_frames(self, e, start):
+        frames = e.reshape(len(e), -1, self.nfft)
+        frames = frames - frames.mean(axis=-1, keepdims=True)
+        self.power += np.sum(np.abs(np.fft.rfft(frames * np.hanning(self.nfft), axis=-1)) ** 2, axis=1)
+        self.num_frames += frames.shape[1]
+        if self._first_frame is None:
+            self._first_frame, self._first_start = frames[:, 0], start
+
+    def update(self, block):
+        """Adds one block of samples; whole frames are transformed, the rest waits for the next block."""
+        block = np.asarray(block, dtype=np.float64)
+        if not len(block):
+            return self
+        e = np.concatenate((self._pending, _nonlinearities(block, self._previous)), axis=1)
+        self._previous = block[-1]
+        self.num_samples += len(block)
+        usable = e.shape[1] // self.nfft * self.nfft
+        if usable:
+            self._add_frames(e[:, :usable], self._pending_start)
+        self._pending = e[:, usable:]
+        self._pending_start += usable
+        return self
+
+    def spectrum(self):
+        """
+        Frequencies and averaged power spectra (one row per nonlinearity). Until
+        a frame is full, the pending samples are transformed on a shorter grid.
+        """
+        if self.num_frames or self._pending.shape[1] < 2:
+            return np.fft.rfftfreq(self.nfft, 1 / self.sampling_rate), self.power
+        e = self._pending - self._pending.mean(axis=-1, keepdims=True)
+        nfft = 1 << int(np.ceil(np.log2(e.shape[1])))
+        power = np.abs(np.fft.rfft(e * np.hanning(e.shape[1]), nfft, axis=-1)) ** 2
+        return np.fft.rfftfreq(nfft, 1 / self.sampling_rate), power
+
+    @staticmethod
+    def _above_floor(power):
+        """Power spectrum divided by its running median."""
+        from scipy.ndimage import median_filter
+
+        floor = median_filter(power, size=FLOOR_BINS, mode="nearest")
+        return power / np.maximum(floor, np.finfo(np.float64).tiny)
+
+    def _line(self, freqs, power, band):
+        """
+        Bin, spectrum index and height (ratio to the local floor) of the
+        fundamental line within `band` (see the module docstring).
+        """
+        from scipy.ndimage import maximum_filter1d
+
+        lines = np.array([self._above_floor(p) for p in power])
+        excess = np.maximum(10 * np.log10(np.maximum(lines, 1e-300)) - LINE_DB, 0.0)
+        excess[:, freqs > (self.carrier_freq or self.sampling_rate / 2)] = 0.0
+        score = np.zeros(len(band))
+        for h in range(1, HARMONICS + 1):
+            harmonic = h * band
+            inside = harmonic < len(freqs)
+            # Harmonic h is looked for within h - 1 bins of h times the bin
+            score[inside] += maximum_filter1d(excess, 2 * h - 1, axis=1)[:, harmonic[inside]].sum(axis=0) / h
+        score[excess[:, band].max(axis=0) == 0] = 0.0
+        k = band[int(np.argmax(score))]
+        which = int(np.argmax(lines[:, k]))
+        return k, which, lines[which, k]
+
+    def estimate(self, rate=None):
+        """
+        Returns (rate, confidence, phase): the symbol rate in symbols/s, the
+        height of its spectral line above the local floor in dB, and the
+        sample index modulo one symbol period at which symbols start. With a
+        known `rate`, only the height and phase of its line are measured.
+        """
+        freqs, power = self.spectrum()
+        if rate is not None:
+            k = int(np.argmin(np.abs(freqs - rate)))
+            heights = [self._above_floor(p)[k] for p in power]
+            which = int(np.argmax(heights))
+            return rate, float(10 * np.log10(max(heights[which], 1e-300))), self._phase(rate, which)
+        step = freqs[1] - freqs[0] if len(freqs) > 1 else self.sampling_rate
+        top = self.sampling_rate / 4
+        if self.carrier_freq:
+            top = min(top, self.carrier_freq / 2)
+        lo, hi = self.rate_range or (8 * step, top)
+        band = np.flatnonzero((freqs >= lo) & (freqs <= hi))
+        if not len(band) or not np.any(power[:, band] > 0):
+            return None, 0.0, 0.0
+        k, which, height = self._line(freqs, power, band)
+        p = power[which]
+        offset = 0.0
+        if 0 < k < len(p) - 1:
+            a, b, c = np.log(p[k - 1:k + 2] + 1e-300)
+            if a - 2 * b + c < 0:
+                offset = 0.5 * (a - c) / (a - 2 * b + c)
+        rate = freqs[k] + offset * step
+        return rate, float(10 * np.log10(height)), self._phase(rate, which)
+
+    def _phase(self, rate, which):
+        """
+        Symbol start index modulo the period, from the line phase over the
+        first frame, where an error on the rate has not accumulated yet.
+        """
+        if self._first_frame is not None:
+            e, start = self._first_frame[which], self._first_start
+        else:
+            e, start = self._pending[which] - np.mean(self._pending[which]), self._pending_start
+        if not len(e):
+            return 0.0
+        period = self.sampling_rate / rate
+        n = start + np.arange(len(e))
+        line = np.sum(e * np.hanning(len(e)) * np.exp(-2j * np.pi * n / period))
+        # The squared difference peaks on symbol starts, the squared signal on symbol centres
+        peak = -np.angle(line) / (2 * np.pi) * period
+        if NONLINEARITIES[which] == "envelope":
+            peak -= period / 2
+        return float(np.mod(peak, period))
+
+
+@instrument
+def estimate_symbol_rate(x, sampling_rate, nfft=8192, rate_range=None, block_size=1 << 20, rate=None,
+                         carrier_freq=None):
+    """
+    Symbol rate, confidence (dB) and phase (samples) of a whole signal, fed in
+    blocks; only the confidence and phase with a known `rate`.
+    """
+    estimator = SymbolRateEstimator(sampling_rate, nfft, rate_range, carrier_freq)
+    for start in range(0, len(x), block_size):
+        estimator.update(x[start:start + block_size])
+    return estimator.estimate(rate)
@@ -15,3 +15,100 @@ def show_code(demo):
         st.markdown("## Code")
         sourcelines, _ = inspect.getsourcelines(demo)
         st.code(textwrap.dedent("".join(sourcelines[1:])))
+
+
+def time_range_slider(duration, key="time_range"):
+    """Sidebar slider selecting the time window (s) shown by the signal plots."""
+    if duration <= 0:
+        return None
+    return st.sidebar.slider("Time range (s)", 0.0, float(duration), (0.0, float(duration)), key=key)
+
+
+def session_artifacts():
+    """The artifact store of the current browser session, created on first use."""
+    from artifacts import ArtifactStore
+
+    if "artifacts" not in st.session_state:
+        st.session_state.artifacts = ArtifactStore()
+    return st.session_state.artifacts
+
+
+def export_artifacts_sidebar(store):
+    """Sidebar summary of the session artifacts with a button writing them to disk."""
+    st.sidebar.caption(f"{len(store)} artifacts in this session ({store.nbytes / 1e6:.1f} MB)")
+    if st.sidebar.button("Export artifacts to disk", disabled=not len(store)):
+        written = store.export_all()
+        st.sidebar.write("Exported: " + ", ".join(written))
+
+
+def precision_sidebar():
+    """Sidebar choice of the dtype policy, applied to this session's run."""
+    from precision import PRECISIONS, set_precision
+
+    name = st.sidebar.selectbox("Precision", PRECISIONS, key="precision")
+    frac_bits = 12
+    if name == "int16":
+        frac_bits = st.sidebar.slider("Fractional bits", 0, 15, 12, key="frac_bits")
+    return set_precision(name, frac_bits)
+
+
+def spectral_settings(key="spectrum"):
+    """Sidebar choice of the segment length, overlap and window of the spectral estimates."""
+    from periodogram import WINDOWS
+
+    st.sidebar.markdown("## Spectrum")
+    nperseg = st.sidebar.select_slider("Segment length", [64, 128, 256, 512, 1024, 2048, 4096], 1024,
+                                       key=f"{key}_nperseg")
+    overlap = st.sidebar.slider("Overlap", 0.0, 0.9, 0.5, 0.05, key=f"{key}_overlap")
+    window = st.sidebar.selectbox("Window", WINDOWS, key=f"{key}_window")
+    return {"nperseg": nperseg, "overlap": overlap, "window": window}
+
+
+def plot_spectrogram(ax, times, freqs, power):
+    """Draws a spectrogram (rows x frequencies) as a dB image, time on the y axis like a waterfall."""
+    import numpy as np
+
+    if not len(times):
+        return ax
+    step = times[1] - times[0] if len(times) > 1 else times[0] * 2
+    ax.imshow(10 * np.log10(power + 1e-20), origin="lower", aspect="auto", cmap="viridis",
+              extent=(freqs[0], freqs[-1], times[0] - step / 2, times[-1] + step / 2))
+    ax.set_xlabel("Frequency (Hz)")
+    ax.set_ylabel("Time (s)")
+    return ax
+
+
+def pyplot(fig):
+    """`st.pyplot`, recorded as the rendering stage when profiling."""
+    from profiling import stage
+
+    with stage("st.pyplot"):
+        st.pyplot(fig)
+
+
+def profiled(run):
+    """
+    Runs the page function `run` with the stage hooks recording when the
+    sidebar "Profile stages" box is ticked, then shows the timings per stage
+    with JSON and CSV downloads of this run.
+    """
+    import profiling
+
+    if not st.sidebar.checkbox("Profile stages", False):
+        profiling.disable()
+        return run()
+    memory = profiling.enable()
+    try:
+        return run()
+    finally:
+        profiling.disable()
+        rows = profiling.records()
+        st.sidebar.markdown("## Stage profile")
+        if not memory:
+            st.sidebar.caption("Profiling busy in another session: times only, no memory figures")
+        st.sidebar.table([{"stage": t["name"], "calls": t["calls"], "wall (ms)": round(t["wall_s"] * 1e3, 2),
+                           "CPU (ms)": round(t["cpu_s"] * 1e3, 2),
+                           "peak (MB)": None if t["alloc_bytes"] is None else round(t["alloc_bytes"] / 1e6, 2)}
+                          for t in profiling.summary(rows)])
+        st.sidebar.download_button("Profile (JSON)", profiling.to_json(rows), "profile.json", "application/json")
+        st.sidebar.download_button("Profile (CSV)", profiling.to_csv(rows), "profile.csv", "text/csv")